@@ -0,0 +1,26 @@
+import numpy as np
+
+
+def reserve(buf, rows, row_shape=(), dtype=np.float32):
+    """
+    buf if it has room for rows rows of row_shape, else a new empty buffer
+    with room for twice as many, so a growing count reallocates rarely.
+    Callers use the first rows rows, e.g. reserve(buf, n, (3,))[:n]
+    """
+    if buf is not None and buf.shape[0] >= rows and buf.shape[1:] == tuple(row_shape) \
+            and buf.dtype == dtype:
+        return buf
+    return np.empty((max(2*rows, 16),) + tuple(row_shape), dtype=dtype)
+
+
+_indices = {}
+
+def indices(n, dtype=np.float32):
+    """0, 1, ..., n-1 as dtype, shared and read-only, e.g. for in place arithmetic progressions"""
+    dtype = np.dtype(dtype)
+    shared = _indices.get(dtype)
+    if shared is None or len(shared) < n:
+        shared = np.arange(max(2*n, 16), dtype=dtype)
+        shared.flags.writeable = False
+        _indices[dtype] = shared
+    return shared[:n]
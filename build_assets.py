@@ -0,0 +1,103 @@
+'''Renders the LaTeX label images listed in resources/labels.json into resources/
+
+Each label is {"output": "hat_k.png", "latex": "$\\hat{k}$"} plus any of the
+render options of latex2image.latex2rgba, i.e. align_bottom, padding, fontsize
+and dpi.  Labels are rendered in parallel on a process pool.  A label is
+skipped when its output exists and the hash of its expression and options
+matches the one recorded in resources/labels.hashes.json at its last build.
+
+  python build_assets.py
+  python build_assets.py --force --jobs 4
+'''
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from latex2image import latex2rgba, latex_cache_key, save_image_atomic
+
+here = os.path.dirname(os.path.abspath(__file__))
+RENDER_OPTIONS = ('align_bottom', 'padding', 'fontsize', 'dpi')
+
+
+def load_manifest(path):
+    with open(path) as f:
+        labels = json.load(f)['labels']
+
+    for label in labels:
+        unknown = set(label) - {'output', 'latex'} - set(RENDER_OPTIONS)
+        if unknown:
+            raise ValueError(f'Invalid keys {sorted(unknown)} in label {label.get("output")} '
+                             f'(allowed keys are output, latex and {RENDER_OPTIONS})')
+    return labels
+
+
+def render_options(label):
+    return {k: label[k] for k in RENDER_OPTIONS if k in label}
+
+
+def label_hash(label):
+    return latex_cache_key(label['latex'], **render_options(label))
+
+
+def render_label(label, out_dir):
+    '''Runs on a worker process, returns (output, hash)'''
+    rgba = latex2rgba(label['latex'], **render_options(label))
+    save_image_atomic(os.path.join(out_dir, label['output']), rgba)
+    return label['output'], label_hash(label)
+
+
+def build(manifest, out_dir, jobs=None, force=False):
+    '''Renders the out of date labels of manifest, returns (built, skipped) output names'''
+    labels = load_manifest(manifest)
+    hashes_path = os.path.splitext(manifest)[0] + '.hashes.json'
+    hashes = {}
+    if os.path.exists(hashes_path):
+        with open(hashes_path) as f:
+            hashes = json.load(f)
+
+    stale = []
+    skipped = []
+    for label in labels:
+        path = os.path.join(out_dir, label['output'])
+        if not force and os.path.exists(path) and hashes.get(label['output']) == label_hash(label):
+            skipped.append(label['output'])
+        else:
+            stale.append(label)
+
+    built = []
+    if stale:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(render_label, label, out_dir) for label in stale]
+            for future in as_completed(futures):
+                output, digest = future.result()
+                hashes[output] = digest
+                built.append(output)
+                print(f'Rendered {output}')
+
+    # only the labels still in the manifest
+    outputs = {label['output'] for label in labels}
+    hashes = {k: v for k, v in sorted(hashes.items()) if k in outputs}
+    tmp_path = hashes_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(hashes, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, hashes_path)
+
+    return built, skipped
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render the LaTeX label images of a manifest')
+    parser.add_argument('--manifest', default=os.path.join(here, 'resources', 'labels.json'),
+                        help='JSON manifest of labels (default: resources/labels.json)')
+    parser.add_argument('--out-dir', default=None,
+                        help='Directory of the images (default: the directory of the manifest)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Worker processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='Render every label, even if up to date')
+    args = parser.parse_args()
+
+    out_dir = args.out_dir or os.path.dirname(os.path.abspath(args.manifest))
+    built, skipped = build(args.manifest, out_dir, jobs=args.jobs, force=args.force)
+    print(f'{len(built)} rendered, {len(skipped)} up to date')
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+def whole_steps(period, step):
+    """Number of steps of a period, None unless the period is a whole number of steps"""
+    steps = round(period / step)
+    if steps < 1 or abs(period / step - steps) > 1e-9 * steps:
+        return None
+    return steps
+
+class PeriodicFrameCache:
+    """Replays the vertex arrays of animations that are periodic in t
+
+    The first time through a period each frame is built and stored, afterwards
+    the stored frame is returned.  Frames are cached at the ticks of the timer,
+    t rounded to a whole number of steps, and only when the period is a whole
+    number of steps.  Otherwise the ticks fall at a different place in every
+    period, a cached frame would be repeated or skipped every few ticks and
+    the animation would judder, so every frame is built.
+
+    Entries are keyed on everything the frame depends on besides t, e.g.
+    (part, freq, phase_diff, axes ranges).  Only the most recently used keys
+    are kept, so dragging a slider doesn't grow the cache without bound.
+    """
+
+    def __init__(self, max_keys=8, max_frames=4096):
+        self.max_keys = max_keys
+        self.max_frames = max_frames
+        self.__entries = OrderedDict()
+
+    def _frames(self, key, steps):
+        """Frame list of key, allocated if missing"""
+        key = (key, steps)
+        frames = self.__entries.get(key)
+        if frames is None:
+            frames = [None] * steps
+            self.__entries[key] = frames
+            while len(self.__entries) > self.max_keys:
+                self.__entries.popitem(last=False)
+        else:
+            self.__entries.move_to_end(key)
+        return frames
+
+    def frame(self, key, t, period, step, build):
+        """
+        key      hashable, everything the frame depends on besides t
+        t        time in seconds
+        period   period of the animation in seconds
+        step     seconds between frames, i.e. the timer interval
+        build    function(t) returning the frame at time t
+
+        Returns the frame built by build for the nearest step
+        """
+        steps = whole_steps(period, step)
+        if steps is None or steps > self.max_frames:
+            # ticks don't repeat every period, or too fine to hold a period, don't cache
+            return build(t)
+
+        frames = self._frames(key, steps)
+        idx = int(round(t / step)) % steps
+        frame = frames[idx]
+        if frame is None:
+            frame = build(idx * step)
+            frames[idx] = frame
+
+        return frame
+
+    def clear(self):
+        self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
@@ -0,0 +1,102 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtGui
+from pyqtgraph.Qt.QtCore import Qt
+from OpenGL import GL
+
+
+def load_scaled_image(path, width, height):
+    """Image at path scaled to fit width x height as an (h,w,4) uint8 RGBA array, None if it can't be read"""
+    image = QtGui.QImage()
+    if not image.load(path):
+        print(f"Error: Could not load image at {path}")
+        return None
+    image = image.scaled(width, height,
+                         Qt.AspectRatioMode.KeepAspectRatio,
+                         Qt.TransformationMode.SmoothTransformation)
+    image = image.convertToFormat(QtGui.QImage.Format.Format_RGBA8888)
+    # copy, the array would otherwise point into the QImage's buffer
+    return np.array(pg.functions.ndarray_from_qimage(image), copy=True)
+
+
+def load_latex_image(latex, options, width, height):
+    """LaTeX expression rendered by latex2image, cached on disk, then loaded like load_scaled_image()"""
+    from latex2image import latex2cached
+
+    return load_scaled_image(latex2cached(latex, **options), width, height)
+
+
+class ImageCache:
+    """Process-wide cache of decoded images and their GL textures, e.g. for labels
+
+    Images are keyed by whatever determines their pixels, e.g. (path, width,
+    height), and decoded once on a background thread.  Textures are uploaded
+    once per GL context from the paint of the first item that shows them.
+    """
+
+    def __init__(self, max_workers=2):
+        self.__lock = threading.Lock()
+        self.__images = {}
+        self.__textures = {}
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers,
+                                             thread_name_prefix='image-decode')
+
+    def preload(self, key, load):
+        """Starts decoding with load(), returning an RGBA array or None, unless key is cached"""
+        with self.__lock:
+            if key not in self.__images:
+                self.__images[key] = self.__executor.submit(load)
+
+    def ready(self, key):
+        with self.__lock:
+            future = self.__images.get(key)
+        return future is not None and future.done()
+
+    def image(self, key):
+        """RGBA array of key, waits for the decode to finish, None if it failed"""
+        with self.__lock:
+            future = self.__images[key]
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error: Could not decode image {key}: {e}")
+            return None
+
+    def texture(self, key):
+        """
+        (texture id, width, height) of key in the current GL context,
+        uploaded on first use, or None if the image failed to decode
+        """
+        context = QtGui.QOpenGLContext.currentContext()
+        tex_key = (id(context), key)
+        if tex_key in self.__textures:
+            return self.__textures[tex_key]
+
+        data = self.image(key)
+        if data is None:
+            self.__textures[tex_key] = None
+            return None
+
+        height, width = data.shape[:2]
+        texture = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, texture)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_RGBA, width, height, 0,
+                        GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, np.ascontiguousarray(data))
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+
+        self.__textures[tex_key] = (texture, width, height)
+        return self.__textures[tex_key]
+
+    def __len__(self):
+        return len(self.__images)
+
+
+# shared by every MyGLImageItem
+image_cache = ImageCache()
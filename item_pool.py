@@ -0,0 +1,81 @@
+class ItemPool:
+    """Keeps the GL items released by a segment, hidden in the scene, for the next segment to reuse
+
+    Items are keyed by (type, style), e.g. (MyVectorFieldItem, 'e'), where the
+    style names everything the factory fixes at construction, e.g. color.  A
+    reused item keeps its GL buffers, so transitions between segments that
+    show the same kinds of items don't rebuild them.  Segments must still set
+    the data, transform and depth of an acquired item.
+    """
+
+    def __init__(self, max_per_key=64):
+        self.max_per_key = max_per_key
+        self.__free = {}
+        self.__in_use = {}
+
+    def acquire(self, key, factory):
+        """
+        key       (type, style) of the item
+        factory   function returning a new item, called when none is free
+
+        Returns a visible item
+        """
+        free = self.__free.get(key)
+        if free:
+            item = free.pop()
+        else:
+            item = factory()
+
+        self.__in_use[id(item)] = key
+        item.setVisible(True)
+        return item
+
+    def prepare(self, key, factory, count=1):
+        """
+        Builds hidden free items of key until count are in use or free, e.g.
+        while the current segment animates, for the segment shown next
+
+        Returns the number of items built
+        """
+        free = self.__free.setdefault(key, [])
+        in_use = sum(1 for k in self.__in_use.values() if k == key)
+        built = 0
+        while in_use + len(free) < min(count, self.max_per_key):
+            item = factory()
+            item.setVisible(False)
+            free.append(item)
+            built += 1
+        return built
+
+    def release(self, item):
+        """Hides item and keeps it for reuse, or detaches it when max_per_key are already free"""
+        key = self.__in_use.pop(id(item))
+        item.setVisible(False)
+
+        free = self.__free.setdefault(key, [])
+        if len(free) < self.max_per_key:
+            free.append(item)
+        else:
+            item.setParentItem(None)
+
+    def sizes(self):
+        """{key name: (in use, free)}"""
+        in_use = {}
+        for key in self.__in_use.values():
+            in_use[key] = in_use.get(key, 0) + 1
+
+        sizes = {}
+        for key in set(in_use) | set(self.__free):
+            sizes[self.keyName(key)] = (in_use.get(key, 0), len(self.__free.get(key, [])))
+        return sizes
+
+    def report(self):
+        """One line per key, e.g. for the timing HUD"""
+        return [f'{name}: {used} in use, {free} free'
+                for name, (used, free) in sorted(self.sizes().items())]
+
+    @staticmethod
+    def keyName(key):
+        kind, style = key
+        kind = getattr(kind, '__name__', str(kind))
+        return f'{kind}/{style}'
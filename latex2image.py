@@ -1,12 +1,107 @@
 #original source: https://medium.com/@ealbanez/how-to-easily-convert-latex-to-images-with-python-9062184dc815
 # Added resizing
+# Renders in memory in a single pass, cached on disk by content
+#
+# matplotlib is only imported to render an expression that isn't cached yet
 
+import hashlib
+import os
+import threading
 
-import matplotlib
-import matplotlib.pyplot as plt
+import numpy as np
 
-# Runtime Configuration Parameters
-matplotlib.rcParams["mathtext.fontset"] = "cm"  # Font changed to Computer Modern
+LATEX_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'latex_cache')
+
+# matplotlib's text layout isn't thread-safe, labels render in the background
+_render_lock = threading.Lock()
+
+
+def latex2rgba(
+        latex_expression, align_bottom=True, padding=0.0, fontsize=50, dpi=200
+):
+    """
+    Renders a LaTeX language string to an autosized (h,w,4) uint8 RGBA array,
+    white text on a transparent background
+
+    Parameters are those of latex2image()
+    """
+    import matplotlib
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    with _render_lock, matplotlib.rc_context({"mathtext.fontset": "cm"}):  # Font changed to Computer Modern
+        # not a pyplot figure, nothing to close, it is freed with the canvas
+        fig = Figure(dpi=dpi, facecolor='none')
+        canvas = FigureCanvasAgg(fig)
+        text = fig.text(
+            x=0.5,
+            y=0.5,
+            s=latex_expression,
+            horizontalalignment="center",
+            verticalalignment="baseline" if align_bottom else "center",
+            fontsize=fontsize,
+            color='white'
+        )
+
+        # measure without drawing the figure
+        bbox = text.get_window_extent(renderer=canvas.get_renderer())
+
+        # Add padding:
+        width_px = bbox.width + 2 * padding
+        height_px = bbox.height + 2 * padding
+
+        # Convert to inches (figure size is in inches):
+        fig.set_size_inches(width_px / dpi, height_px / dpi)
+
+        # Adjust the text position (optional, to keep it centered):
+        text.set_x(0.5)  # Center horizontally
+        text.set_y(0.0 if align_bottom else 0.5)  # Center vertically
+
+        canvas.draw()
+        return np.array(canvas.buffer_rgba(), dtype=np.uint8, copy=True)
+
+
+def latex_cache_key(
+        latex_expression, align_bottom=True, padding=0.0, fontsize=50, dpi=200
+):
+    """Hash of everything the rendered image depends on"""
+    params = repr((latex_expression, bool(align_bottom), float(padding), fontsize, float(dpi)))
+    return hashlib.sha256(params.encode('utf-8')).hexdigest()
+
+
+def latex2cached(latex_expression, cache_dir=LATEX_CACHE_DIR, **kwds):
+    """
+    Path of a png of the LaTeX language string, rendered only if it isn't in cache_dir yet
+
+    kwds are the parameters of latex2rgba()
+    """
+    path = os.path.join(cache_dir, latex_cache_key(latex_expression, **kwds) + '.png')
+    if os.path.exists(path):
+        return path
+
+    save_image_atomic(path, latex2rgba(latex_expression, **kwds))
+    return path
+
+
+def save_image_atomic(path, rgba):
+    """Writes an RGBA array as a png at path, a reader never sees half a file"""
+    # written next to the final name and renamed
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        _save_image(tmp_path, rgba, format='png')
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _save_image(path, rgba, format=None):
+    from matplotlib import image
+
+    image.imsave(path, rgba, format=format)
 
 
 def latex2image(
@@ -23,8 +118,8 @@ def latex2image(
         Equation in LaTeX markup language.
     image_name : str or path-like
         Full path or filename including filetype.
-        Accepeted filetypes include: png, pdf, ps, eps and svg.
-    align_bottom : Aligns bottom if True, else centers.  Useful for latex with superscripts and no subscripts 
+        Accepeted filetypes include: png, jpg and any other raster format of Pillow.
+    align_bottom : Aligns bottom if True, else centers.  Useful for latex with superscripts and no subscripts
     padding: padding in pixelsaround image
     fontsize : float or str, optional
         Font size, that can be expressed as float or
@@ -32,40 +127,14 @@ def latex2image(
 
     Returns
     -------
-    fig : object
-        Matplotlib figure object from the class: matplotlib.figure.Figure.
+    rgba : numpy.ndarray
+        (h,w,4) uint8 RGBA image, as written to image_name
 
     """
-    fig = plt.figure(figsize=None, dpi=dpi, facecolor=None)
-    text = fig.text(
-        x=0.5,
-        y=0.5,
-        s=latex_expression,
-        horizontalalignment="center",
-        verticalalignment="baseline" if align_bottom else "center",
-        fontsize=fontsize,
-        color='white'
-    )
-    
-    # must render to calculate bounding box
-    plt.savefig(image_name, transparent=True)
-
-    # resize image
-    bbox = text.get_window_extent()
-    
-    # Add padding:
-    width_px = bbox.width + 2 * padding
-    height_px = bbox.height + 2 * padding
-
-    # Convert to inches (figure size is in inches):
-    width_in = width_px / fig.dpi
-    height_in = height_px / fig.dpi
-    fig.set_size_inches(width_in, height_in)
-
-    # Adjust the text position (optional, to keep it centered):
-    text.set_x(0.5)  # Center horizontally
-    text.set_y(0.0 if align_bottom else 0.5)  # Center vertically
-    
-    plt.savefig(image_name, transparent=True)
-    
-    return fig
+    rgba = latex2rgba(latex_expression,
+                      align_bottom=align_bottom,
+                      padding=padding,
+                      fontsize=fontsize,
+                      dpi=dpi)
+    _save_image(image_name, rgba)
+    return rgba
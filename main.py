@@ -1,7 +1,25 @@
+import time
+# before the imports, for --startup-profile
+_start_time = time.perf_counter()
+
+import os
 import sys
 
-from observer import Observable
-from my_widgets import *
+from observer import EventBus
+from my_widgets import (
+    linear_scale,
+    MyTimer,
+    MyGLViewWidget,
+    MyGLAxisItem,
+    MyGLImageItem,
+    MyVectorFieldItem
+    )
+from wave_field import WaveField, SuperpositionField
+from frame_cache import PeriodicFrameCache
+from recorder import BackgroundFrameWriter, next_take_directory
+from profiler import profiler, startup
+from item_pool import ItemPool
+from segments import segment_class
 import numpy as np
 from enum import IntEnum
 
@@ -9,7 +27,8 @@ import pyqtgraph as pg
 import pyqtgraph.opengl as gl
 from pyqtgraph.Qt.QtCore import (
     Qt,
-    QUrl
+    QUrl,
+    QTimer
     )
 from pyqtgraph.Qt.QtGui import (
     QDoubleValidator,
@@ -29,6 +48,16 @@ from pyqtgraph.Qt.QtWidgets import (
     QPushButton
     )
 
+startup.begin(_start_time)
+startup.mark('import')
+
+# resources are found next to this file, whatever the working directory
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+
+# the last chapter shows a SuperpositionField, the others a WaveField
+SUPERPOSITION_CHAPTER = 4
+CHAPTERS = 4
+
 
 class AxesSettingsLayout(QGridLayout):
     def __init__(self):
@@ -37,7 +66,8 @@ class AxesSettingsLayout(QGridLayout):
         self.setColumnStretch(0,1)
         self.setColumnStretch(1,1)
 
-        self.user_changes_observable = Observable()
+        # the boxes are edited a keystroke at a time
+        self.user_changes_observable = EventBus(debounce=200)
         
         _,self.x_min_box = self._buildLimitComponents('X Min', 0)
         _,self.x_max_box = self._buildLimitComponents('X Max', 1)
@@ -116,12 +146,23 @@ class UserMode(IntEnum):
     EXPLAINER = 2
         
 class BaseWidget(QWidget):
-    def __init__(self, start_segment=1, start_chapter=1, user_mode=UserMode.EXPLAINER):
+    def __init__(self, start_segment=1, start_chapter=1, user_mode=UserMode.EXPLAINER,
+                 interval=100, clock='fixed', prefetch=True, superposition=None):
         '''
         User modes:
           0 = Super user, shows all options of all users plus debugging
           1 = Simulation Only, only shows the options for simulation
           2 = Explainer Mode, shows the simulation and the explainer
+
+        interval is the animation time step in milliseconds and clock is
+        one of MyTimer.CLOCKS, e.g. 'manual' for offline rendering
+
+        prefetch builds the GL items of the neighbouring segments, hidden,
+        once a segment is on screen
+
+        superposition is the components table of the SuperpositionField of
+        the superposition chapter, see SuperpositionField.setComponents(),
+        by default SuperpositionField.squareWave()
         '''
         super().__init__()
 
@@ -129,34 +170,59 @@ class BaseWidget(QWidget):
         self.resize(500,500)
 
         # gl view
-        self.canvas = gl.GLViewWidget()
+        self.canvas = MyGLViewWidget()
         self.canvas.show()
         
         # canvas items
         self.timer = None
+        self.clock = clock
+        self.interval = interval
+        self.frame_cache = PeriodicFrameCache()
+        self.pool = ItemPool()
+        self.canvas.hud_sources.append(self.pool.report)
+        self.graph_vertices = 0
+        self.canvas.hud_sources.append(lambda: [f'graph vertices: {self.graph_vertices}'])
+        self.prefetch = prefetch
+        self.first_frame_shown = False
+        self.canvas.frameSwapped.connect(self.onFrameSwapped)
         self.frame = 0
-        self.magnitude = 3.0
-        self.freq = 0.5
-        self.phase_diff = 0.0
-        self.phase_diff_int = 0
+        self.frames_dropped = 0
+        self.single_wave = WaveField(magnitude=3.0,
+                                     freq=0.5,
+                                     phase_diff=0.0)
+        if superposition is None:
+            superposition = SuperpositionField.squareWave()
+        self.superposition = SuperpositionField(superposition,
+                                                magnitude=3.0,
+                                                freq=0.5)
+        self.wave = self.single_wave
 
         self.prev_part_button = None
         self.next_part_button = None
         self.prev_chapter_button = None
         self.next_chapter_button = None
         self.pause_button = None
+        self.record_button = None
+        self.profiler_button = None
         self.right_circ_button = None
         self.left_circ_button = None
         
         self.freq_label = None
         self.phase_diff_label = None
         self.phase_diff_slider = None
+        self.ratio_label = None
+        self.ratio_slider = None
 
         self.chapter = None
         self.segment = None
 
         # windows
         self.scene_settings_widget = None
+
+        # recording, frames are saved by a background writer
+        self.frame_writer = None
+        self.recording = False
+        self.take_dir = None
         
         # menu options
         opts_layout = QGridLayout()
@@ -214,23 +280,38 @@ class BaseWidget(QWidget):
         
         w = QSlider(Qt.Horizontal)
         w.setValue(0)
-        w.setMinimum(-2)
-        w.setMaximum(2)
+        w.setMinimum(-1000)
+        w.setMaximum(1000)
         w.valueChanged.connect(self.handlePhaseChange)
         self.phase_diff_slider = w
         
         opts_layout.addWidget(l, 4, 0)
         opts_layout.addWidget(w, 4, 1)
 
+
+        l = QLabel("Amplitude Ratio")
+        self.ratio_label = l
+        self.updateRatioLabel()
+
+        w = QSlider(Qt.Horizontal)
+        w.setMinimum(0)
+        w.setMaximum(1000)
+        w.setValue(1000)
+        w.valueChanged.connect(self.handleRatioChange)
+        self.ratio_slider = w
+
+        opts_layout.addWidget(l, 5, 0)
+        opts_layout.addWidget(w, 5, 1)
+
         w = QPushButton("Right Circular")
         w.clicked.connect(self.handleRightCircularPress)
         self.right_circ_button = w
-        opts_layout.addWidget(w, 5, 0)
+        opts_layout.addWidget(w, 6, 0)
 
         w = QPushButton("Left Circular")
         w.clicked.connect(self.handleLeftCircularPress)
         self.left_circ_button = w
-        opts_layout.addWidget(w, 5, 1)
+        opts_layout.addWidget(w, 6, 1)
 
         # Explainer User
         if user_mode == UserMode.EXPLAINER \
@@ -240,8 +321,8 @@ class BaseWidget(QWidget):
             w = QPushButton("Show Explainer")
             w.clicked.connect(self.handleShowExplainerPress)
             
-            opts_layout.addWidget(l, 6, 0)
-            opts_layout.addWidget(w, 6, 1)
+            opts_layout.addWidget(l, 7, 0)
+            opts_layout.addWidget(w, 7, 1)
 
         
         # Super user controls
@@ -251,26 +332,48 @@ class BaseWidget(QWidget):
             w = QPushButton("Show Scene Settings")
             w.clicked.connect(self.handleShowSceneSettingsPress)
             
-            opts_layout.addWidget(l, 7, 0)
-            opts_layout.addWidget(w, 7, 1)
+            opts_layout.addWidget(l, 8, 0)
+            opts_layout.addWidget(w, 8, 1)
 
             
-            # l = QLabel("Save Image")
+            l = QLabel("Save Image")
             
-            # w = QPushButton("Capture")
-            # w.clicked.connect(self.handleSaveImagePress)
+            w = QPushButton("Capture")
+            w.clicked.connect(self.handleSaveImagePress)
             
-            # opts_layout.addWidget(l, 6, 0)
-            # opts_layout.addWidget(w, 6, 1)
+            opts_layout.addWidget(l, 9, 0)
+            opts_layout.addWidget(w, 9, 1)
+
+            
+            l = QLabel("Record Video")
+
+            w = QPushButton("Start Recording")
+            w.clicked.connect(self.handleRecordPress)
+            self.record_button = w
+
+            opts_layout.addWidget(l, 10, 0)
+            opts_layout.addWidget(w, 10, 1)
+
+
+            w = QPushButton("Show Timing HUD")
+            w.clicked.connect(self.handleProfilerPress)
+            self.profiler_button = w
+
+            opts_layout.addWidget(w, 11, 0)
+
+            w = QPushButton("Dump Timing CSV")
+            w.clicked.connect(self.handleDumpProfilePress)
+
+            opts_layout.addWidget(w, 11, 1)
 
             
-            # l = QLabel("Debug Action")
+            l = QLabel("Debug Action")
             
-            # w = QPushButton("Action")
-            # w.clicked.connect(self.handleDebugActionPress)
+            w = QPushButton("Action")
+            w.clicked.connect(self.handleDebugActionPress)
             
-            # opts_layout.addWidget(l, 7, 0)
-            # opts_layout.addWidget(w, 7, 1)
+            opts_layout.addWidget(l, 12, 0)
+            opts_layout.addWidget(w, 12, 1)
 
         
         ### main layout
@@ -281,19 +384,81 @@ class BaseWidget(QWidget):
         self.setLayout(main_layout)
         
         # start
+        startup.mark('widgets')
         self.setupScene()
+        startup.mark('axis build')
         self.transitionTo(start_segment, start_chapter)
+        startup.mark('segment setup')
         
+    #
+    # Wave parameters, owned by self.wave
+    #
+    @property
+    def magnitude(self):
+        return self.wave.magnitude
+
+    @magnitude.setter
+    def magnitude(self, value):
+        self.wave.magnitude = value
+
+    @property
+    def freq(self):
+        return self.wave.freq
+
+    @freq.setter
+    def freq(self, value):
+        self.wave.freq = value
+
+    @property
+    def phase_diff(self):
+        return self.wave.phase_diff
+
+    @phase_diff.setter
+    def phase_diff(self, value):
+        self.wave.phase_diff = value
+
+    @property
+    def ratio(self):
+        return self.wave.ratio
+
+    @ratio.setter
+    def ratio(self, value):
+        self.wave.ratio = value
+
     def setupScene(self):
         self.buildAxes()
 
     def updateScene(self, t):
+        if not profiler.enabled:
+            self.segment.updateScene(self, t)
+            return
+
+        profiler.beginFrame(self.chapter, self.segment.segment_num)
+        start = time.perf_counter()
         self.segment.updateScene(self, t)
+        profiler.add('update', time.perf_counter() - start)
         
     def updateAndRenderScene(self, t):
         self.updateScene(t)
-        self.canvas.grabFramebuffer().save(f'video/take_1/frame_{self.frame}.png')
-        self.frame += 1
+        # numbered without gaps, e.g. for ffmpeg -framerate, the next frame takes the number of a dropped one
+        if self.frameWriter().submit(self.canvas.grabFramebuffer(),
+                                     os.path.join(self.take_dir, f'frame_{self.frame:05d}.png')):
+            self.frame += 1
+        else:
+            self.frames_dropped += 1
+
+    def onFrameSwapped(self):
+        if self.first_frame_shown:
+            return
+        self.first_frame_shown = True
+        self.canvas.frameSwapped.disconnect(self.onFrameSwapped)
+        startup.finish('first frame')
+        self.prefetchNeighbours()
+
+    def frameWriter(self):
+        if self.frame_writer is None:
+            self.frame_writer = BackgroundFrameWriter()
+        return self.frame_writer
         
     def buildAxes(self):
         self.axes = MyGLAxisItem(x_min=-3, x_max=3,
@@ -307,15 +472,15 @@ class BaseWidget(QWidget):
         self.canvas.addItem(self.axes)
         
         # labels
-        l = MyGLImageItem(image='resources/hat_e_1.png',
+        l = MyGLImageItem(image=os.path.join(RESOURCE_DIR, 'hat_e_1.png'),
                           height=30)
         self.axes.setXLabel(l)
         
-        l = MyGLImageItem(image='resources/hat_e_2.png',
+        l = MyGLImageItem(image=os.path.join(RESOURCE_DIR, 'hat_e_2.png'),
                           height=30)
         self.axes.setYLabel(l)
 
-        l = MyGLImageItem(image='resources/hat_k.png',
+        l = MyGLImageItem(image=os.path.join(RESOURCE_DIR, 'hat_k.png'),
                           height=30)
         self.axes.setZLabel(l)
 
@@ -349,6 +514,29 @@ class BaseWidget(QWidget):
         self.transitionTo(self.segment.segment_num,
                           self.chapter - 1)
     
+    def neighbourSegments(self):
+        '''(segment_num, chapter) reachable with the part and chapter buttons, most likely first'''
+        segment_num = self.segment.segment_num
+        neighbours = [(segment_num % 6 + 1, self.chapter + (segment_num == 6)),
+                      ((segment_num - 2) % 6 + 1, self.chapter - (segment_num == 1)),
+                      (segment_num, self.chapter + 1),
+                      (segment_num, self.chapter - 1)]
+        return [(s, c) for s, c in neighbours if 1 <= c <= CHAPTERS]
+
+    def prefetchNeighbours(self):
+        '''Builds the pool items of the neighbouring segments, hidden, so a transition doesn't construct GL items'''
+        if not self.prefetch or self.segment is None:
+            return
+
+        for segment_num, chapter in self.neighbourSegments():
+            for key, factory in segment_class(segment_num)().poolItems(self):
+                self.pool.prepare(key, factory)
+
+    def waveForChapter(self, chapter):
+        if chapter == SUPERPOSITION_CHAPTER:
+            return self.superposition
+        return self.single_wave
+
     def transitionTo(self, segment_num, chapter_num):
         # destroy old scene
         self.stopAnimating()
@@ -359,50 +547,46 @@ class BaseWidget(QWidget):
         # chapter updates
         self.chapter = chapter_num
 
-        self.next_chapter_button.setDisabled(not (self.chapter < 3))
+        self.next_chapter_button.setDisabled(not (self.chapter < CHAPTERS))
         self.prev_chapter_button.setDisabled(not (self.chapter > 1))
 
-        self.next_part_button.setDisabled(self.chapter == 3 and segment_num == 6)
+        self.next_part_button.setDisabled(self.chapter == CHAPTERS and segment_num == 6)
         self.prev_part_button.setDisabled(self.chapter == 1 and segment_num == 1)
         
         if self.chapter == 3:
             self.phase_diff_label.setHidden(False)
             self.phase_diff_slider.setHidden(False)
+            self.ratio_label.setHidden(False)
+            self.ratio_slider.setHidden(False)
             self.right_circ_button.setHidden(False)
             self.left_circ_button.setHidden(False)
         else:
             self.phase_diff_label.setHidden(True)
             self.phase_diff_slider.setHidden(True)
+            self.ratio_label.setHidden(True)
+            self.ratio_slider.setHidden(True)
             self.right_circ_button.setHidden(True)
             self.left_circ_button.setHidden(True)
-            self.phase_diff_int = 0
-            self.phase_diff = 0.0
-            self.updatePhaseDiffLabel()
             self.phase_diff_slider.setValue(0)
-            
-        # load next segment class
-        _module = __import__('segments')
-        _class = None
-
-        if segment_num == 1:
-            _class = getattr(_module, 'Part1')
-        elif segment_num == 2:
-            _class = getattr(_module, 'Part2')
-        elif segment_num == 3:
-            _class = getattr(_module, 'Part3')
-        elif segment_num == 4:
-            _class = getattr(_module, 'Part4')
-        elif segment_num == 5:
-            _class = getattr(_module, 'Part5')
-        elif segment_num == 6:
-            _class = getattr(_module, 'Part6')
-        else:
-            print('Unknown segment number')
+            self.ratio_slider.setValue(1000)
+
+        # after the sliders are reset, they act on the wave of the old chapter
+        # the magnitude and freq sliders act on every wave
+        wave = self.waveForChapter(self.chapter)
+        wave.magnitude = self.wave.magnitude
+        wave.freq = self.wave.freq
+        self.wave = wave
+        if self.chapter != SUPERPOSITION_CHAPTER:
+            self.wave.polarized = self.chapter > 1
             
         # start new scene
-        self.segment = _class()
+        self.segment = segment_class(segment_num)()
         self.segment.setupScene(self)
         self.startAnimating()
+
+        # once the first frame is queued, the very first frame waits for nothing
+        if self.first_frame_shown:
+            QTimer.singleShot(0, self.prefetchNeighbours)
         
         
     #
@@ -425,8 +609,13 @@ class BaseWidget(QWidget):
         
     def startAnimating(self):
         self.stopAnimating()
+        # t starts over at 0, and so does the phase of the wave
+        self.wave.phase_offset = 0.0
 
-        self.timer = MyTimer(block=self.updateScene)
+        self.timer = MyTimer(interval=self.interval,
+                             block=self.animationBlock(),
+                             clock=self.clock,
+                             frame_source=self.canvas)
         self.timer.start_timer()
         self.pause_button.setText('Pause Animation')
 
@@ -435,9 +624,56 @@ class BaseWidget(QWidget):
             self.timer.stop_timer()
             self.timer = None
 
+    def animationTime(self):
+        '''t of the last frame in seconds'''
+        if self.timer is None:
+            return 0.0
+        return self.timer.t
+
+    def refreshScene(self):
+        '''Shows a parameter change at once, the running timer shows it on its next tick'''
+        if self.timer is not None and not self.timer.is_running():
+            self.updateScene(self.animationTime())
+
+    def animationBlock(self):
+        if self.recording:
+            return self.updateAndRenderScene
+        return self.updateScene
+
+    #
+    # Recording
+    #
+    def startRecording(self):
+        self.take_dir = next_take_directory()
+        self.frame = 0
+        self.frames_dropped = 0
+        self.recording = True
+        if self.timer is not None:
+            self.timer.block = self.animationBlock()
+        self.record_button.setText('Stop Recording')
+
+    def stopRecording(self):
+        self.recording = False
+        if self.timer is not None:
+            self.timer.block = self.animationBlock()
+        self.record_button.setText('Start Recording')
+
+        writer = self.frameWriter()
+        print(f'Recorded {self.frame} frames to {self.take_dir}, {self.frames_dropped} dropped, '
+              f'{writer.failed} failed to save in total')
+
     #
     # Window Handlers
     #
+    def closeEvent(self, event):
+        # flush frames still waiting to be written
+        if self.recording:
+            self.stopRecording()
+        if self.frame_writer is not None:
+            self.frame_writer.close()
+            self.frame_writer = None
+        super().closeEvent(event)
+
     def showSceneSettings(self):
         # check if need to alloc new window
         if self.scene_settings_widget is None:
@@ -454,7 +690,9 @@ class BaseWidget(QWidget):
     def handleAxesSettingsChange(self, observable, user_data):
         #print(f"New axes settings: {user_data}")
         self.axes.setData(**user_data)
-        self.restartAnimation()
+        if self.segment is not None:
+            self.segment.axesChanged(self)
+        self.refreshScene()
 
     #
     # Button Handlers
@@ -478,55 +716,88 @@ class BaseWidget(QWidget):
         self.togglePauseAnimation()
 
     def handleFreqChange(self, val):
-        self.freq = linear_scale(x1=0.5,
-                                 x2=5.0,
-                                 y2=1000,
-                                 y=val)
-        self.restartAnimation()
+        # keep the phase continuous at the current frame, at the time the segment shows the wave
+        self.wave.setFreq(linear_scale(x1=0.5,
+                                       x2=5.0,
+                                       y2=1000,
+                                       y=val),
+                          self.segment.waveTime(self.animationTime()))
+        self.refreshScene()
         self.updateFreqLabel()
 
     def handlePhaseChange(self, val):
-        self.phase_diff_int = val
-        self.phase_diff = val * np.pi / 4
-        
-        self.restartAnimation()
+        self.phase_diff = linear_scale(x1=-np.pi,
+                                       x2=np.pi,
+                                       y1=-1000,
+                                       y2=1000,
+                                       y=val)
+        self.refreshScene()
         self.updatePhaseDiffLabel()
 
+    def handleRatioChange(self, val):
+        self.ratio = val / 1000
+        self.refreshScene()
+        self.updateRatioLabel()
+
     def handleRightCircularPress(self, state):
-        self.handlePhaseChange(-2)
-        self.phase_diff_slider.setValue(-2)
+        self.ratio_slider.setValue(1000)
+        self.phase_diff_slider.setValue(-500)
         
     def handleLeftCircularPress(self, state):
-        self.handlePhaseChange(2)
-        self.phase_diff_slider.setValue(2)
+        self.ratio_slider.setValue(1000)
+        self.phase_diff_slider.setValue(500)
 
     def handleShowExplainerPress(self, state):
-        url = QUrl.fromLocalFile("resources/explainer_slides.pdf")
+        url = QUrl.fromLocalFile(os.path.join(RESOURCE_DIR, "explainer_slides.pdf"))
         QDesktopServices.openUrl(url)
 
     def handleShowSceneSettingsPress(self, state):
         self.showSceneSettings()
         
     def handleSaveImagePress(self, state):
-        self.canvas.grabFramebuffer().save('images/fileName.png')
+        path = time.strftime('images/capture_%Y%m%d_%H%M%S.png')
+        self.frameWriter().submit(self.canvas.grabFramebuffer(), path, block=True)
+
+    def handleProfilerPress(self, state):
+        if profiler.enabled:
+            profiler.disable()
+            self.canvas.show_hud = False
+            self.profiler_button.setText('Show Timing HUD')
+        else:
+            profiler.enable(prep_methods=[(gl.GLLinePlotItem, 'setData'),
+                                          (gl.GLMeshItem, 'setMeshData'),
+                                          (MyVectorFieldItem, 'setData')])
+            self.canvas.show_hud = True
+            self.profiler_button.setText('Hide Timing HUD')
+        self.canvas.update()
+
+    def handleDumpProfilePress(self, state):
+        path = time.strftime('profile_%Y%m%d_%H%M%S.csv')
+        count = profiler.dumpCsv(path)
+        print(f'Wrote {count} frame timings to {path}')
+
+    def handleRecordPress(self, state):
+        if self.recording:
+            self.stopRecording()
+        else:
+            self.startRecording()
     
     def handleDebugActionPress(self, state):
         print(self.canvas.cameraPosition())
         print(self.canvas.opts)
+        print('\n'.join(self.pool.report()))
 
     #
     # Utils
     #
     def updateFreqLabel(self):
-        self.freq_label.setText(f'Frequency\n{self.freq}')
+        self.freq_label.setText(f'Frequency\n{self.freq:.2f}')
 
     def updatePhaseDiffLabel(self):
-        if self.phase_diff_int == 0:
-            self.phase_diff_label.setText("Relative Phase\n0")
-        else:
-            denom = int(np.abs(4 / self.phase_diff_int))
-            sign = '' if self.phase_diff_int > 0 else '-'
-            self.phase_diff_label.setText(f"Relative Phase\n{sign}\u03c0/{denom}")
+        self.phase_diff_label.setText(f"Relative Phase\n{self.phase_diff / np.pi:.2f}\u03c0")
+
+    def updateRatioLabel(self):
+        self.ratio_label.setText(f"Amplitude Ratio\n{self.ratio:.2f}")
 
 
 ##
@@ -555,16 +826,130 @@ if __name__ == "__main__":
         default=1,
         help="The chapter that the simulation start at"
     )
+    parser.add_argument(
+        "--superposition",
+        default=None,
+        help="CSV of the component waves of chapter 4, one per row of amplitude, "
+             "polarization angle (degrees), relative frequency and phase (degrees)"
+    )
+    parser.add_argument(
+        "--clock",
+        choices=MyTimer.CLOCKS,
+        default='fixed',
+        help="Animation clock (default: fixed). fixed: t advances one interval per tick. "
+             "wall: precise timer, t from a monotonic clock, skips frames instead of slowing down. "
+             "vsync: like wall but ticks on every frame swap, i.e. at the display rate. "
+             "manual: fixed step, used by --render"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=100,
+        help="Animation time step in milliseconds for the fixed and wall clocks (default: 100)"
+    )
+    parser.add_argument(
+        "--freq",
+        type=float,
+        default=None,
+        help="Angular frequency of the wave (default: 0.5)"
+    )
+    parser.add_argument(
+        "--phase-diff",
+        type=float,
+        default=None,
+        help="Relative phase of the second component in radians, used with --render (default: 0)"
+    )
+    parser.add_argument(
+        "--render",
+        metavar="OUTPUT",
+        default=None,
+        help="Render to a video file with a fixed time step, e.g. out.mp4, needs a display, "
+             "run under xvfb-run -a without one. "
+             "Without ffmpeg installed, raw RGBA frames are written to OUTPUT with a .rgba extension"
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=10.0,
+        help="Seconds of animation to render with --render (default: 10)"
+    )
+    parser.add_argument(
+        "--fps",
+        type=int,
+        default=30,
+        help="Frames per second, i.e. the fixed time step, of --render (default: 30)"
+    )
+    parser.add_argument(
+        "--size",
+        default="1280x720",
+        help="WIDTHxHEIGHT of the frames rendered with --render (default: 1280x720)"
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Print the time spent importing, creating the QApplication, building the window, "
+             "creating the GL context and drawing the first frame"
+    )
     args = parser.parse_args()
+    startup.enabled = args.startup_profile
+
+    superposition = None
+    if args.superposition is not None:
+        superposition = SuperpositionField.load(args.superposition)
+
+    if args.render is not None:
+        # Mesa software GL, the same pixels on every machine
+        os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
     
     # run app
     app = pg.mkQApp()
+    startup.mark('QApplication')
+
+    if args.render is not None:
+        from recorder import open_frame_sink, render_offscreen
+
+        width, height = (int(v) for v in args.size.lower().split('x'))
+
+        w = BaseWidget(
+            start_segment=args.start_part,
+            start_chapter=args.start_chapter,
+            user_mode=UserMode.SIMULATION,
+            interval=1000.0 / args.fps,
+            clock='manual',
+            prefetch=False,
+            superposition=superposition
+        )
+        w.canvas.setFixedSize(width, height)
+        w.show()
+        if args.freq is not None:
+            w.freq = args.freq
+        if args.phase_diff is not None:
+            w.phase_diff = args.phase_diff
+        w.restartAnimation()
+
+        sink = open_frame_sink(args.render, width, height, args.fps)
+        try:
+            render_offscreen(w, sink, int(round(args.duration * args.fps)))
+        finally:
+            sink.close()
+
+        print(f'Rendered {sink.frame_count} frames to {sink.path}')
+        if hasattr(sink, 'encodeCommand'):
+            print(f'ffmpeg not found, encode with:\n  {sink.encodeCommand(args.render)}')
+        sys.exit(0)
 
     w = BaseWidget(
         start_segment=args.start_part,
         start_chapter=args.start_chapter,
-        user_mode=args.user_mode
+        user_mode=args.user_mode,
+        interval=args.interval,
+        clock=args.clock,
+        superposition=superposition
     )
+    if args.freq is not None:
+        w.freq = args.freq
+        w.updateFreqLabel()
     w.show()
+    startup.mark('show')
 
     sys.exit(app.exec())  # Start the Qt event loop
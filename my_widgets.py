@@ -1,49 +1,174 @@
+import functools
+import time
+
 import numpy as np
+from OpenGL import GL
+from OpenGL.GL import shaders
 
 from pyqtgraph.Qt import QtGui
 from pyqtgraph.Qt import QtCore
 from pyqtgraph.Qt.QtCore import Qt
 import pyqtgraph.opengl as gl
+from pyqtgraph import Transform3D
+from pyqtgraph.opengl.items.GLLinePlotItem import DirtyFlag
+
+from profiler import profiler, startup
+from image_cache import image_cache, load_scaled_image, load_latex_image
+from buffers import reserve
 
 def linear_scale(x1=0.0,x2=1.0,y1=0.0,y2=1.0,y=0.5):
     return (float(y)-y1)/(y2-y1) * (x2-x1) + x1
 
 class MyTimer(QtCore.QObject):
-    'Time units are milliseconds; block is a function type'
-    def __init__(self, duration=None, interval=100, block=None):
+    """Time units are milliseconds; block is a function type
+
+    Clock modes
+      'fixed'    t advances by interval every tick, whatever the real time elapsed
+      'wall'     a precise timer ticks every interval and t is read from a monotonic
+                 clock, so a long frame skips ahead rather than slowing the animation
+      'vsync'    like 'wall', but ticks on frame_source's frameSwapped signal,
+                 i.e. at the display rate, frame_source is the GL widget
+      'manual'   like 'fixed', but only ticks when step() is called, e.g. exports
+    """
+    CLOCKS = ('fixed', 'wall', 'vsync', 'manual')
+
+    def __init__(self, duration=None, interval=100, block=None, clock='fixed', frame_source=None):
         super().__init__()
 
+        if clock not in self.CLOCKS:
+            raise ValueError('Invalid clock: %s (allowed clocks are %s)' % (clock, str(self.CLOCKS)))
+        if clock == 'vsync' and frame_source is None:
+            raise ValueError('The vsync clock needs a frame_source')
+
         self.duration = duration
         self.interval = interval
         self.block = block
+        self.clock = clock
+        self.frame_source = frame_source
         self.counter = 0.0
+        self.t = 0.0
         self.__is_running = False
-        
-        self.timer = QtCore.QTimer()
-        self.timer.setInterval(self.interval)
-        self.timer.timeout.connect(self.on_timeout)
-        
+        self.__started_at = None
+
+        self.timer = None
+        if clock == 'fixed' or clock == 'wall':
+            self.timer = QtCore.QTimer()
+            self.timer.setInterval(int(round(self.interval)))
+            if clock == 'wall':
+                self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+            self.timer.timeout.connect(self.on_timeout)
+
     def start_timer(self):
+        if self.__is_running:
+            return
         self.__is_running = True
-        self.timer.start()
+        # resume from the paused time
+        self.__started_at = time.monotonic() - self.counter / 1000
+        if self.timer is not None:
+            self.timer.start()
+        elif self.clock == 'vsync':
+            self.frame_source.frameSwapped.connect(self.on_frame_swapped)
+            self.frame_source.update()
 
     def stop_timer(self):
+        if not self.__is_running:
+            return
         self.__is_running = False
-        self.timer.stop()
+        if self.timer is not None:
+            self.timer.stop()
+        elif self.clock == 'vsync':
+            self.frame_source.frameSwapped.disconnect(self.on_frame_swapped)
 
     def is_running(self):
         return self.__is_running
-        
+
+    def step(self):
+        'Advances a manual clock by one interval'
+        if self.__is_running:
+            self.on_timeout()
+
+    def on_frame_swapped(self):
+        if not self.__is_running:
+            return
+        self.on_timeout()
+        # request the next frame
+        self.frame_source.update()
+
     def on_timeout(self):
+        if self.clock == 'wall' or self.clock == 'vsync':
+            self.counter = (time.monotonic() - self.__started_at) * 1000
+
         if self.duration is not None \
            and self.counter >= self.duration:
-            self.timer.stop()
+            self.stop_timer()
 
         # call function block with float t in seconds
+        self.t = float(self.counter) / 1000
         if self.block is not None:
-            self.block(float(self.counter) / 1000)
-            
-        self.counter += self.interval
+            self.block(self.t)
+
+        if self.clock == 'fixed' or self.clock == 'manual':
+            self.counter += self.interval
+
+
+class MyGLViewWidget(gl.GLViewWidget):
+    """GLViewWidget that times paintGL for the profiler and can draw its timing HUD
+
+    hud_sources is a list of functions returning extra lines for the HUD
+    """
+
+    def __init__(self, *args, **kwds):
+        super().__init__(*args, **kwds)
+        self.show_hud = False
+        self.hud_sources = []
+
+    def frustumPlanes(self, item=None):
+        """
+        (6,4) array of the planes of the view frustum in the coordinates of
+        item, or of the scene if None.  A point p is in view when
+        planes @ (p_x, p_y, p_z, 1) >= 0 for every plane.
+        """
+        viewport = self.getViewport()
+        m = self.projectionMatrix(viewport, viewport) * self.viewMatrix()
+        if item is not None:
+            m = m * item.viewTransform()
+        m = np.array(m.data()).reshape((4,4)).T
+        return np.array([m[3] + m[0], m[3] - m[0],
+                         m[3] + m[1], m[3] - m[1],
+                         m[3] + m[2], m[3] - m[2]])
+
+    def initializeGL(self):
+        super().initializeGL()
+        startup.mark('GL context')
+
+    def paintGL(self, *args, **kwds):
+        if not profiler.enabled:
+            super().paintGL(*args, **kwds)
+            return
+
+        start = time.perf_counter()
+        super().paintGL(*args, **kwds)
+        profiler.markPaint(time.perf_counter() - start)
+
+        if self.show_hud:
+            self.paintHud()
+
+    def paintHud(self):
+        font = QtGui.QFont('Monospace')
+        font.setStyleHint(QtGui.QFont.StyleHint.TypeWriter)
+        font.setPointSize(9)
+
+        painter = QtGui.QPainter(self)
+        painter.setFont(font)
+        painter.setPen(QtGui.QColor(255, 255, 0))
+        y = 16
+        lines = profiler.summary()
+        for source in self.hud_sources:
+            lines += source()
+        for line in lines:
+            painter.drawText(8, y, line)
+            y += 14
+        painter.end()
 
 
 def generate_cone(radius, height, segments):
@@ -88,14 +213,111 @@ def generate_cone(radius, height, segments):
     return gl.MeshData(vertexes=vertices, faces=faces)
 
 
+def rotations_from_z(vecs):
+    """
+    Batch orientation of arrow tips without trigonometry
+
+    Args:
+        vecs: (N,3) array of vectors, need not be normalized
+
+    Returns:
+        (N,3,3) rotation matrices taking +z onto the direction of each vector.
+        Zero-length vectors get the identity and vectors pointing along -z get a
+        half turn about x, both handled analytically rather than through a division.
+    """
+    vecs = np.asarray(vecs, dtype=float).reshape((-1,3))
+    length = np.sqrt(np.einsum('ij,ij->i', vecs, vecs))
+
+    # zero-length vectors keep the +z direction, i.e. the identity
+    dirs = np.zeros(vecs.shape)
+    dirs[:,2] = 1.0
+    nonzero = length > 1e-12
+    dirs[nonzero] = vecs[nonzero] / length[nonzero,None]
+
+    dx = dirs[:,0]
+    dy = dirs[:,1]
+    c = dirs[:,2]
+
+    # Rodrigues' formula about z x d, with (1-cos)/sin^2 = 1/(1+cos)
+    anti = (1.0 + c) <= 1e-12
+    k = np.zeros(c.shape)
+    np.divide(1.0, 1.0 + c, out=k, where=~anti)
+
+    rot = np.empty((vecs.shape[0],3,3))
+    rot[:,0,0] = 1.0 - dx*dx*k
+    rot[:,0,1] = -dx*dy*k
+    rot[:,0,2] = dx
+    rot[:,1,0] = rot[:,0,1]
+    rot[:,1,1] = 1.0 - dy*dy*k
+    rot[:,1,2] = dy
+    rot[:,2,0] = -dx
+    rot[:,2,1] = -dy
+    rot[:,2,2] = c
+
+    # antiparallel, half turn about x
+    rot[anti] = np.diag([1.0, -1.0, -1.0])
+
+    return rot
+
+
+def rotations_from_z_into(dirs, c, k, anti, out):
+    """
+    rotations_from_z() of the unit vectors dirs, written into out without allocating
+
+    Args:
+        dirs: (N,3) array of unit vectors, or zero
+        c, k: (N,) scratch arrays
+        anti: (N,) bool scratch array
+        out: (N,3,3) array of the rotations
+
+    Where 1+cos is down to the rounding of the dtype of k, i.e. close to -z,
+    the vectors get the reflection of +z onto d rather than a rotation, which
+    is all the same for the arrow tips, they're symmetric.  Zero vectors get
+    a matrix taking +z to zero, their tips have no length.
+    """
+    dx = dirs[:,0]
+    dy = dirs[:,1]
+    np.copyto(c, dirs[:,2])
+
+    # Rodrigues' formula with 1/(1+cos), or where 1+cos is rounding noise the
+    # reflection in the plane normal to z - d, the same with 1/(1-cos) and the
+    # sign of the last row flipped
+    np.add(c, 1.0, out=k)
+    np.less_equal(k, np.sqrt(np.finfo(k.dtype).eps), out=anti)
+    np.subtract(1.0, c, out=k, where=anti)
+    np.reciprocal(k, out=k)
+
+    np.multiply(dx, dx, out=out[:,0,0])
+    out[:,0,0] *= k
+    np.subtract(1.0, out[:,0,0], out=out[:,0,0])
+    np.multiply(dx, dy, out=out[:,0,1])
+    out[:,0,1] *= k
+    np.negative(out[:,0,1], out=out[:,0,1])
+    np.copyto(out[:,0,2], dx)
+    np.copyto(out[:,1,0], out[:,0,1])
+    np.multiply(dy, dy, out=out[:,1,1])
+    out[:,1,1] *= k
+    np.subtract(1.0, out[:,1,1], out=out[:,1,1])
+    np.copyto(out[:,1,2], dy)
+    np.negative(dx, out=out[:,2,0])
+    np.negative(dy, out=out[:,2,1])
+    np.copyto(out[:,2,0], dx, where=anti)
+    np.copyto(out[:,2,1], dy, where=anti)
+    np.copyto(out[:,2,2], c)
+    return out
+
+
 class MyVectorItem(gl.GLGraphicsItem.GLGraphicsItem):
     def __init__(self, start=[0.0,0.0,0.0], end=[1.0,1.0,1.0], color=[1.0,1.0,1.0,1.0], width=1.0, parentItem=None, glOptions='opaque', antialias=True):
         super().__init__()
 
         self.lineplot = None
         
-        self.start = np.array(start)
-        self.end = np.array(end)
+        # updated in place, see setPosition()
+        self.start = np.array(start, dtype=np.float32)
+        self.end = np.array(end, dtype=np.float32)
+        self.__pos = np.empty((2,3), dtype=np.float32)
+        self.__tr = np.identity(4)
         self.width = width
         self.tip_height = 0.3
         self.tip_radius = 0.15
@@ -120,8 +342,8 @@ class MyVectorItem(gl.GLGraphicsItem.GLGraphicsItem):
         self.updateLines()
 
     def setPosition(self, start=[0.0,0.0,0.0], end=[1.0,1.0,1.0]):
-        self.start = np.array(start)
-        self.end = np.array(end)
+        self.start[:] = start
+        self.end[:] = end
         self.updateLines()
         
         
@@ -129,36 +351,436 @@ class MyVectorItem(gl.GLGraphicsItem.GLGraphicsItem):
         if self.lineplot == None:
             return
 
-        pos = np.array([self.start, self.end])
+        pos = self.__pos
+        pos[0] = self.start
+        pos[1] = self.end
         self.lineplot.setData(pos=pos, color=self.color)
 
         self.tip_mesh.setColor(self.color)
-        self.tip_mesh.resetTransform()
-        self.tip_mesh.translate(0,0,-self.tip_height)
 
-        # determine angle between default mesh axis and the vector
-        z = np.array([0.0, 0.0, 1.0])
+        # orient the tip, apex at the end of the vector
         v = self.end - self.start
         v_len = np.linalg.norm(v)
-        angle = np.arccos(np.sum(z*v) / v_len)
-        angle = angle * 180 / np.pi # degrees
-        
-        # rotate tip
-        rotate_axis = np.cross(z, v) 
-        self.tip_mesh.rotate(angle, rotate_axis[0], rotate_axis[1], rotate_axis[2])
+        rot = rotations_from_z(v)[0]
 
-        self.tip_mesh.translate(*self.end)
+        tr = self.__tr
+        tr[:3,:3] = rot
+        tr[:3,3] = self.end - self.tip_height * rot[:,2]
+        self.tip_mesh.setTransform(Transform3D(*tr.ravel()))
 
         self.tip_mesh.setVisible(v_len >= self.tip_height)
-        
+
         self.update()
-        
+
+
+class MyVectorFieldItem(gl.GLGraphicsItem.GLGraphicsItem):
+    """Draws N vectors with one line buffer for the shafts and one merged mesh for the tips
+
+    Vectors and vertexes live in float32 buffers that only grow, updated in
+    place every setData() and handed to the GL items without copies.
+    """
+
+    def __init__(self, start=None, end=None, color=[1.0,1.0,1.0,1.0], width=5.0, parentItem=None, glOptions='opaque', antialias=True):
+        super().__init__()
+
+        self.lineplot = None
+
+        self.__start = None
+        self.__end = None
+        self.start = np.zeros((0,3), dtype=np.float32)
+        self.end = np.zeros((0,3), dtype=np.float32)
+        self.color = color
+        self.tip_height = 0.3
+        self.tip_radius = 0.15
+        self.tip_segments = 8
+
+        # cone template with its apex at the origin
+        cone_md = generate_cone(radius=self.tip_radius, height=self.tip_height, segments=self.tip_segments)
+        self.cone_vertexes = cone_md.vertexes() - np.array([0.0, 0.0, self.tip_height])
+        self.cone_faces = cone_md.faces()
+        # homogeneous, see updateLines()
+        self.__cone = np.ones((self.cone_vertexes.shape[0],4), dtype=np.float32)
+        self.__cone[:,:3] = self.cone_vertexes
+
+        # per vector buffers, see updateLines()
+        self.__pos = None
+        self.__line_colors = None
+        self.__dirs = None
+        self.__len = None
+        self.__c = None
+        self.__k = None
+        self.__anti = None
+        self.__short = None
+        self.__frames = None
+        self.__verts = None
+        self.__tip_colors = None
+        self.__faces = None
+
+        self.lineplot = gl.GLLinePlotItem(
+            parentItem=self, glOptions=glOptions, mode='lines', antialias=antialias
+        )
+        self.lineplot.setData(width=width)
+
+        self.tip_mesh = gl.GLMeshItem(parentItem=self,
+                                      color=np.array(color, dtype=float),
+                                      smooth=True,    # no normals, indexed faces upload the vertexes as they are
+                                      computeNormals=False,
+                                      glOptions=glOptions)
+
+        self.setParentItem(parentItem)
+        if start is not None and end is not None:
+            self.setData(start=start, end=end)
+        else:
+            self.updateLines()
+
+    def setData(self, start=None, end=None, color=None):
+        """
+        start, end     (N,3) arrays of vector tails and heads
+        color          (4,) color shared by every vector, or (N,4) array of a color per vector
+        """
+        if start is not None:
+            start = np.asarray(start).reshape((-1,3))
+            self.__start = reserve(self.__start, len(start), (3,))
+            self.start = self.__start[:len(start)]
+            np.copyto(self.start, start)
+        if end is not None:
+            end = np.asarray(end).reshape((-1,3))
+            self.__end = reserve(self.__end, len(end), (3,))
+            self.end = self.__end[:len(end)]
+            np.copyto(self.end, end)
+        if color is not None:
+            self.color = color
+            if np.ndim(color) == 1:
+                self.tip_mesh.setColor(color)
+
+        if self.start.shape != self.end.shape:
+            raise ValueError('"start" and "end" must have the same shape.')
+        if np.ndim(self.color) == 2 and len(self.color) != len(self.start):
+            raise ValueError('"color" must have one row per vector.')
+
+        self.updateLines()
+
+    def count(self):
+        return self.start.shape[0]
+
+    def updateLines(self):
+        if self.lineplot is None:
+            return
+
+        n = self.count()
+        self.lineplot.setVisible(n > 0)
+        self.tip_mesh.setVisible(n > 0)
+        if n == 0:
+            self.update()
+            return
+
+        # shafts, one segment per vector
+        self.__pos = reserve(self.__pos, 2*n, (3,))
+        pos = self.__pos[:2*n]
+        np.copyto(pos[0::2], self.start)
+        np.copyto(pos[1::2], self.end)
+        per_vector = np.ndim(self.color) == 2
+        if per_vector:
+            self.__line_colors = reserve(self.__line_colors, 2*n, (4,))
+            line_colors = self.__line_colors[:2*n].reshape((n,2,4))
+            np.copyto(line_colors, np.asarray(self.color)[:,None,:])
+            self.lineplot.setData(pos=pos, color=line_colors.reshape((-1,4)))
+        else:
+            self.lineplot.setData(pos=pos, color=self.color)
+
+        # tips, the cone template rotated onto each vector and moved to its head
+        self.__dirs = reserve(self.__dirs, n, (3,))
+        self.__len = reserve(self.__len, n)
+        self.__c = reserve(self.__c, n)
+        self.__k = reserve(self.__k, n)
+        self.__anti = reserve(self.__anti, n, dtype=bool)
+        self.__short = reserve(self.__short, n, dtype=bool)
+        self.__frames = reserve(self.__frames, n, (4,3))
+        dirs = self.__dirs[:n]
+        v_len = self.__len[:n]
+        short = self.__short[:n]
+        frames = self.__frames[:n]
+
+        # column by column, in place broadcasting would buffer the whole array
+        np.subtract(self.end, self.start, out=dirs)
+        np.hypot(dirs[:,0], dirs[:,1], out=v_len)
+        np.hypot(v_len, dirs[:,2], out=v_len)
+        np.less(v_len, self.tip_height, out=short)
+        np.maximum(v_len, 1e-12, out=v_len)
+        for i in range(3):
+            np.divide(dirs[:,i], v_len, out=dirs[:,i])
+
+        # (rotation | head) as the rows of a 4x3 matrix per vector, so
+        # the homogeneous cone vertexes are placed by a single product
+        rotations_from_z_into(dirs, self.__c[:n], self.__k[:n], self.__anti[:n],
+                              frames[:,:3,:].transpose((0,2,1)))
+        np.copyto(frames[:,3,:], self.end)
+
+        m = self.cone_vertexes.shape[0]
+        self.__verts = reserve(self.__verts, n, (m,3))
+        verts = self.__verts[:n]
+        np.matmul(self.__cone, frames, out=verts)
+
+        # collapse tips longer than their vector
+        np.copyto(verts, self.end[:,None,:], where=short[:,None,None])
+
+        # the faces of the first n tips, valid for any n up to the capacity
+        f = self.cone_faces.shape[0]
+        capacity = self.__verts.shape[0]
+        if self.__faces is None or self.__faces.shape[0] != capacity*f:
+            offsets = (np.arange(capacity, dtype=np.uint32) * m)[:,None,None]
+            self.__faces = (self.cone_faces[None,:,:].astype(np.uint32) + offsets).reshape((-1,3))
+
+        if per_vector:
+            self.__tip_colors = reserve(self.__tip_colors, n, (m,4))
+            tip_colors = self.__tip_colors[:n]
+            np.copyto(tip_colors, np.asarray(self.color)[:,None,:])
+            self.tip_mesh.setMeshData(vertexes=verts.reshape((-1,3)),
+                                      faces=self.__faces[:n*f],
+                                      vertexColors=tip_colors.reshape((-1,4)))
+        else:
+            self.tip_mesh.setMeshData(vertexes=verts.reshape((-1,3)),
+                                      faces=self.__faces[:n*f])
+
+        self.update()
+
+
+def glsl_sources(ctx, core, legacy):
+    """
+    (version line, sources) of a shader for the QOpenGLContext ctx, the core
+    sources where it has GLSL 1.40 or ES 3.00, else the legacy sources
+    """
+    fmt = ctx.format()
+    if ctx.isOpenGLES():
+        if fmt.version() >= (3, 0):
+            return "#version 300 es\n", core
+    elif fmt.version() >= (3, 1):
+        return "#version 140\n", core
+    return "", legacy
+
+
+class WaveCurveItem(gl.GLLinePlotItem):
+    """Line strip of the E or B field of a WaveField, evaluated by the vertex shader
+
+    The z samples are uploaded once, as points on the z-axis, and the vertex
+    shader displaces them by the field, see WaveField.  A frame only sets a
+    few uniforms.  Where the shader can't be compiled, or for waves it can't
+    evaluate (shader_supported is False), the positions are evaluated by the
+    wave on the CPU and uploaded every frame instead.
+
+    field is 'E' or 'B', all other keyword arguments are passed to
+    GLLinePlotItem
+    """
+
+    # per GL context, keyed by id(context) like ImageCache.texture()
+    _wavePrograms = {}
+    gpu_enabled = True    # cleared if the shader fails to compile
+
+    def __init__(self, field='E', parentItem=None, **kwds):
+        if field not in ('E', 'B'):
+            raise ValueError('Invalid field: %s (allowed fields are E and B)' % field)
+        super().__init__(parentItem=parentItem, **kwds)
+        self.field = field
+        self.__zs = None
+        self.__wave = None
+        self.__t = 0.0
+        self.__grid_uploaded = False
+        self.__program = None
+        self.__pos = None
+        self.__fields = None
+
+    def setWave(self, wave, zs, t):
+        """Shows the field of wave at time t sampled at zs, an (n,) array"""
+        if zs is not self.__zs:
+            self.__zs = zs
+            self.__grid_uploaded = False
+        self.__wave = wave
+        self.__t = t
+        self.update()
+
+    def clear(self):
+        """Shows nothing until the next setWave()"""
+        self.__wave = None
+        self.update()
+
+    def positions(self):
+        """
+        (n,3) positions of the curve evaluated by the wave on the CPU, in a
+        float32 buffer reused from frame to frame
+        """
+        # evaluated in float64 like the grid, a cast on the way out would buffer
+        n = len(self.__zs)
+        self.__fields = reserve(self.__fields, n, (2,3), dtype=float)
+        fields = self.__fields[:n]
+        field = self.__wave.E(self.__zs, self.__t, out=fields[:,0])
+        if self.field == 'B':
+            field = self.__wave.B(field, out=fields[:,1])
+
+        self.__pos = reserve(self.__pos, n, (3,))
+        pos = self.__pos[:n]
+        np.copyto(pos, field)
+        return pos
+
+    def getShaderProgram(self):
+        # picked once per paint(), GLLinePlotItem.paint() asks again to draw
+        if self.__program is None:
+            return gl.GLLinePlotItem.getShaderProgram()
+        return self.__program
+
+    @staticmethod
+    def getWaveShaderProgram():
+        klass = WaveCurveItem
+
+        if not klass.gpu_enabled:
+            return None
+
+        ctx = QtGui.QOpenGLContext.currentContext()
+        program = klass._wavePrograms.get(id(ctx))
+        if program is not None:
+            return program
+
+        glsl_version, sources = glsl_sources(ctx, WAVE_SHADER_CORE, WAVE_SHADER_LEGACY)
+
+        try:
+            compiled = [shaders.compileShader([glsl_version, v], k) for k, v in sources.items()]
+            program = shaders.compileProgram(*compiled)
+        except Exception as e:
+            print(f"Wave shader unavailable, evaluating on the CPU: {e}")
+            klass.gpu_enabled = False
+            return None
+
+        GL.glBindAttribLocation(program, 0, "a_position")
+        GL.glBindAttribLocation(program, 1, "a_color")
+        GL.glLinkProgram(program)
+
+        klass._wavePrograms[id(ctx)] = program
+        return program
+
+    def setWaveUniforms(self, program):
+        """Sets the uniforms of the wave shader for the current wave and t, program must be in use"""
+        wave = self.__wave
+        # the phase is reduced here, float32 cos loses precision for large angles
+        uniforms = {
+            'u_magnitude': wave.magnitude,
+            'u_ratio': wave.ratio if wave.polarized else 0.0,
+            'u_freq': wave.freq,
+            'u_phase': float(wave.phase(self.__t)) % (2*np.pi),
+            'u_phase_diff': wave.phase_diff,
+            'u_field': 1.0 if self.field == 'B' else 0.0,
+        }
+        for name, value in uniforms.items():
+            GL.glUniform1f(GL.glGetUniformLocation(program, name), value)
+
+    def paint(self):
+        if self.__wave is None or self.__zs is None:
+            return
+
+        wave = self.__wave
+        program = self.getWaveShaderProgram() if wave.shader_supported else None
+        self.__program = program
+        if program is None:
+            # CPU fallback
+            self.pos = self.positions()
+            self.dirty_bits |= DirtyFlag.POSITION
+            self.__grid_uploaded = False
+        else:
+            if not self.__grid_uploaded:
+                pos = np.zeros((len(self.__zs), 3), dtype=np.float32)
+                pos[:,2] = self.__zs
+                self.pos = pos
+                self.dirty_bits |= DirtyFlag.POSITION
+                self.__grid_uploaded = True
+
+            # uniforms are kept by the program until GLLinePlotItem.paint() draws
+            with program:
+                self.setWaveUniforms(program)
+
+        super().paint()
+
+
+# E_1 = magnitude cos(theta), E_2 = ratio magnitude cos(theta + phase_diff)
+# theta = freq*z - phase, B is E rotated by 90 degrees about z, see WaveField
+WAVE_SHADER_LEGACY = {
+    GL.GL_VERTEX_SHADER : """
+        uniform mat4 u_mvp;
+        uniform float u_magnitude;
+        uniform float u_ratio;
+        uniform float u_freq;
+        uniform float u_phase;
+        uniform float u_phase_diff;
+        uniform float u_field;
+        attribute vec4 a_position;
+        attribute vec4 a_color;
+        varying vec4 v_color;
+        void main() {
+            float z = a_position.z;
+            float theta = u_freq * z - u_phase;
+            vec2 e = u_magnitude * vec2(cos(theta), u_ratio * cos(theta + u_phase_diff));
+            vec2 xy = mix(e, vec2(-e.y, e.x), u_field);
+            v_color = a_color;
+            gl_Position = u_mvp * vec4(xy, z, 1.0);
+        }
+    """,
+    GL.GL_FRAGMENT_SHADER : """
+        #ifdef GL_ES
+        precision mediump float;
+        #endif
+        varying vec4 v_color;
+        void main() {
+            gl_FragColor = v_color;
+        }
+    """,
+}
+
+WAVE_SHADER_CORE = {
+    GL.GL_VERTEX_SHADER : """
+        uniform mat4 u_mvp;
+        uniform float u_magnitude;
+        uniform float u_ratio;
+        uniform float u_freq;
+        uniform float u_phase;
+        uniform float u_phase_diff;
+        uniform float u_field;
+        in vec4 a_position;
+        in vec4 a_color;
+        out vec4 v_color;
+        void main() {
+            float z = a_position.z;
+            float theta = u_freq * z - u_phase;
+            vec2 e = u_magnitude * vec2(cos(theta), u_ratio * cos(theta + u_phase_diff));
+            vec2 xy = mix(e, vec2(-e.y, e.x), u_field);
+            v_color = a_color;
+            gl_Position = u_mvp * vec4(xy, z, 1.0);
+        }
+    """,
+    GL.GL_FRAGMENT_SHADER : """
+        #ifdef GL_ES
+        precision mediump float;
+        #endif
+        in vec4 v_color;
+        out vec4 fragColor;
+        void main() {
+            fragColor = v_color;
+        }
+    """,
+}
+
+
 # Inspiration: https://github.com/pyqtgraph/pyqtgraph/blob/master/pyqtgraph/opengl/items/GLAxisItem.py
-class MyGLAxisItem(gl.GLGraphicsItem.GLGraphicsItem):    
+class MyGLAxisItem(gl.GLGraphicsItem.GLGraphicsItem):
+    """x, y and z axes with major ticks and labels
+
+    setData() only rebuilds the lines and ticks of the axes whose settings
+    changed, and a change of visibility only shows or hides items.
+    """
+    AXES = ('x', 'y', 'z')
+
     def __init__(self, parentItem=None, antialias=True, glOptions='translucent', **kwds):
         super().__init__()
 
-        self.lineplot = None    # mark that we are still initializing
+        self.x_line = None    # mark that we are still initializing
+        self.y_line = None
+        self.z_line = None
         self.x_major_plot = None
         self.y_major_plot = None
         self.z_major_plot = None
@@ -195,10 +817,15 @@ class MyGLAxisItem(gl.GLGraphicsItem.GLGraphicsItem):
         self.setData(**kwds)
         
         # line plots
-        self.lineplot = gl.GLLinePlotItem(
-            parentItem=self, glOptions=glOptions, mode='lines', antialias=antialias
+        self.z_line = gl.GLLinePlotItem(
+            parentItem=self, glOptions=glOptions, mode='lines', antialias=antialias, width=3.0
+        )
+        self.y_line = gl.GLLinePlotItem(
+            parentItem=self, glOptions=glOptions, mode='lines', antialias=antialias, width=3.0
+        )
+        self.x_line = gl.GLLinePlotItem(
+            parentItem=self, glOptions=glOptions, mode='lines', antialias=antialias, width=3.0
         )
-        self.lineplot.setData(width=3.0)
         
         self.x_major_plot = gl.GLLinePlotItem(
             parentItem=self, glOptions=glOptions, mode='lines', antialias=antialias
@@ -274,102 +901,117 @@ class MyGLAxisItem(gl.GLGraphicsItem.GLGraphicsItem):
             if k not in args:
                 raise ValueError('Invalid keyword argument: %s (allowed arguments are %s)' % (k, str(args)))
 
+        dirty = set()
+        visibility_changed = False
         for arg in args:
             if arg in kwds:
                 value = kwds[arg]
+                if np.array_equal(getattr(self, arg), value):
+                    continue
                 setattr(self, arg, value)
 
+                if arg == 'major_height':
+                    dirty.update(self.AXES)
+                elif arg.endswith('_visible'):
+                    visibility_changed = True
+                else:
+                    dirty.add(arg[0])
+
         # done 
-        self.updateLines()
+        if self.x_line is None:
+            # still initializing
+            return
+        for axis in self.AXES:
+            if axis in dirty:
+                self.updateAxis(axis)
+        if visibility_changed:
+            self.updateVisibility()
+        if dirty or visibility_changed:
+            self.update()
         
     
     def updateLines(self):
-        if self.lineplot is None:
+        """Rebuilds every axis"""
+        if self.x_line is None:
             # still initializing
             return
 
-        ### axis lines
-        pos = []
-        color = []
-        if self.z_visible:
-            pos.append([0, 0, self.z_min, 0, 0, self.z_max])
-            color.append(self.z_color)
-        if self.y_visible:
-            pos.append([0, self.y_min, 0, 0, self.y_max, 0])
-            color.append(self.y_color)
-        if self.x_visible:
-            pos.append([self.x_min, 0, 0, self.x_max, 0, 0])
-            color.append(self.x_color)
-            
-        pos = np.array(pos, dtype=np.float32).reshape((-1, 3))
-
-        color = np.array(color, dtype=np.float32)
-        color = np.hstack((color, color)).reshape((-1, 4))
-
-        self.lineplot.setData(pos=pos, color=color)
+        for axis in self.AXES:
+            self.updateAxis(axis)
+        self.updateVisibility()
+        self.update()
+
+    def updateAxis(self, axis):
+        """Rebuilds the line, major ticks and label position of one axis, 'x', 'y' or 'z'"""
+        idx = self.AXES.index(axis)
+        min_val = getattr(self, f'{axis}_min')
+        max_val = getattr(self, f'{axis}_max')
+        step = getattr(self, f'{axis}_step')
+        plane = getattr(self, f'{axis}_tick_plane')
+        color = getattr(self, f'{axis}_color')
+
+        ### axis line
+        pos = np.zeros((2,3), dtype=np.float32)
+        pos[0,idx] = min_val
+        pos[1,idx] = max_val
+        getattr(self, f'{axis}_line').setData(pos=pos, color=color)
 
         ###### Major Ticks
-        def buildMajorTickPos(min_val, max_val, step, height, axis, plane):
-            neg_ticks = np.arange(-step, min_val-step, -step)
-            pos_ticks = np.arange(step, max_val+step, step)
-            ticks = np.concatenate((np.flip(neg_ticks), pos_ticks))
-            ticks = ticks.repeat(2)
-
-            pos = np.zeros((ticks.size,3))
-            pos[:,axis] = ticks
-            pos[:,plane] = np.tile([height/2, -height/2], ticks.size//2) 
-            
-            return pos
-
-        tick_color = np.array([1, 1, 1, 1], dtype=np.float32)
-        
-        self.x_major_plot.setData(pos=buildMajorTickPos(self.x_min,
-                                                        self.x_max,
-                                                        self.x_step,
-                                                        self.major_height,
-                                                        0,
-                                                        self.x_tick_plane),
-                                  color=self.x_color)
-        self.x_major_plot.setVisible(self.x_visible)
-        
-        self.y_major_plot.setData(pos=buildMajorTickPos(self.y_min,
-                                                        self.y_max,
-                                                        self.y_step,
-                                                        self.major_height,
-                                                        1,
-                                                        self.y_tick_plane),
-                                  color=self.y_color)
-        self.y_major_plot.setVisible(self.y_visible)
-        
-        self.z_major_plot.setData(pos=buildMajorTickPos(self.z_min,
-                                                        self.z_max,
-                                                        self.z_step,
-                                                        self.major_height,
-                                                        2,
-                                                        self.z_tick_plane),
-                                  color=self.z_color)
-        self.z_major_plot.setVisible(self.z_visible)
+        neg_ticks = np.arange(-step, min_val-step, -step)
+        pos_ticks = np.arange(step, max_val+step, step)
+        ticks = np.concatenate((np.flip(neg_ticks), pos_ticks))
+        ticks = ticks.repeat(2)
+
+        pos = np.zeros((ticks.size,3))
+        pos[:,idx] = ticks
+        pos[:,plane] = np.tile([self.major_height/2, -self.major_height/2], ticks.size//2)
+
+        getattr(self, f'{axis}_major_plot').setData(pos=pos, color=color)
 
-        
         #####
-        self.updateLabels()
-        self.update()
+        self.updateLabel(axis)
+
+    def updateVisibility(self):
+        for axis in self.AXES:
+            visible = getattr(self, f'{axis}_visible')
+            getattr(self, f'{axis}_line').setVisible(visible)
+            getattr(self, f'{axis}_major_plot').setVisible(visible)
+            label = getattr(self, f'{axis}_label')
+            if not label is None:
+                label.setVisible(visible)
+
+    def updateLabel(self, axis):
+        label = getattr(self, f'{axis}_label')
+        if label is None:
+            return
 
-    def updateLabels(self):
         pad=0.25
-        if not self.x_label is None:
-            self.x_label.setData(pos=[self.x_max+pad, 0.0, 0.0])
-            self.x_label.setVisible(self.x_visible)
-        if not self.y_label is None:
-            self.y_label.setData(pos=[0.0, self.y_max+pad, 0.0])
-            self.y_label.setVisible(self.y_visible)
-        if not self.z_label is None:
-            self.z_label.setData(pos=[0.0, 0.0, self.z_max+pad])
-            self.z_label.setVisible(self.z_visible)
+        pos = [0.0, 0.0, 0.0]
+        pos[self.AXES.index(axis)] = getattr(self, f'{axis}_max') + pad
+        label.setData(pos=pos)
+        label.setVisible(getattr(self, f'{axis}_visible'))
+
+    def updateLabels(self):
+        for axis in self.AXES:
+            self.updateLabel(axis)
 
 # Inspiration: https://github.com/pyqtgraph/pyqtgraph/blob/master/pyqtgraph/opengl/items/GLTextItem.py
+# and https://github.com/pyqtgraph/pyqtgraph/blob/master/pyqtgraph/opengl/items/GLImageItem.py
 class MyGLImageItem(gl.GLGraphicsItem.GLGraphicsItem):
-    """Draws image in 3D but always faces camera"""
+    """Draws image in 3D but always faces camera
+
+    The image is drawn as a textured quad of constant size in pixels with its
+    top left corner at pos.  Images are decoded in the background by
+    image_cache as soon as they are set, and their textures are shared by
+    every item showing the same (image, width, height).
+
+    latex is rendered like an image, from the on-disk cache of latex2image
+    once it has been rendered by any run.
+    """
+
+    # per GL context, keyed by id(context) like ImageCache.texture()
+    _shaderPrograms = {}
+    _quadBuffers = {}
 
     def __init__(self, parentItem=None, **kwds):
         """All keyword arguments are passed to setData()"""
@@ -379,9 +1021,11 @@ class MyGLImageItem(gl.GLGraphicsItem.GLGraphicsItem):
 
         self.pos = np.array([0.0, 0.0, 0.0])
         self.image = None
+        self.latex = None
+        self.latex_options = {}
         self.height = 100
         self.width = 100
-        self.__qimage = None
+        self.__key = None
         self.setData(**kwds)
 
 
@@ -396,11 +1040,14 @@ class MyGLImageItem(gl.GLGraphicsItem.GLGraphicsItem):
         ------------------------------------------------------------------------
         pos                   (3,) array of floats specifying text location.
         image                 string - path to image
+        latex                 string - LaTeX expression, replaces image
+        latex_options         dict - keyword arguments of latex2image.latex2rgba,
+                              e.g. align_bottom
         height                integer - image height *will keep aspect ratio
         width                 integer - image width *will keep aspect ratio
         ====================  ==================================================
         """
-        args = ['pos', 'image', 'height', 'width']
+        args = ['pos', 'image', 'latex', 'latex_options', 'height', 'width']
         for k in kwds.keys():
             if k not in args:
                 raise ValueError('Invalid keyword argument: %s (allowed arguments are %s)' % (k, str(args)))
@@ -414,47 +1061,180 @@ class MyGLImageItem(gl.GLGraphicsItem.GLGraphicsItem):
                     elif isinstance(value, (tuple, list)):
                         if len(value) != 3:
                             raise ValueError('"len(pos)" must be 3.')
-                elif arg == 'image' or arg == 'height' or arg == 'width':
-                    self.__qimage = None
                 setattr(self, arg, value)
             self.update()
 
-
+        # start decoding before the first paint
+        if self.latex is not None:
+            options = tuple(sorted(self.latex_options.items()))
+            self.__key = (('latex', self.latex, options), self.width, self.height)
+            image_cache.preload(self.__key,
+                                functools.partial(load_latex_image, self.latex, self.latex_options,
+                                                  self.width, self.height))
+        elif self.image is not None:
+            self.__key = (self.image, self.width, self.height)
+            image_cache.preload(self.__key,
+                                functools.partial(load_scaled_image, self.image, self.width, self.height))
+        else:
+            self.__key = None
+
+
+
+    def waitForImage(self):
+        """Blocks until the image is decoded, e.g. before rendering a frame that must show it"""
+        if self.__key is not None:
+            image_cache.image(self.__key)
+
+    @staticmethod
+    def getShaderProgram():
+        klass = MyGLImageItem
+
+        ctx = QtGui.QOpenGLContext.currentContext()
+        program = klass._shaderPrograms.get(id(ctx))
+        if program is not None:
+            return program
+
+        glsl_version, sources = glsl_sources(ctx, BILLBOARD_SHADER_CORE, BILLBOARD_SHADER_LEGACY)
+
+        compiled = [shaders.compileShader([glsl_version, v], k) for k, v in sources.items()]
+        program = shaders.compileProgram(*compiled)
+
+        GL.glBindAttribLocation(program, 0, "a_position")
+        GL.glLinkProgram(program)
+
+        klass._shaderPrograms[id(ctx)] = program
+        return program
+
+    @staticmethod
+    def getQuadBuffer():
+        """VBO of the corners of the quad in [0,1] and their texture coordinates, in the current GL context"""
+        klass = MyGLImageItem
+
+        ctx = QtGui.QOpenGLContext.currentContext()
+        vbo = klass._quadBuffers.get(id(ctx))
+        if vbo is not None:
+            return vbo
+
+        quad = np.array([[0, 0, 0, 0],
+                         [1, 0, 1, 0],
+                         [0, 1, 0, 1],
+                         [1, 1, 1, 1]], dtype=np.float32)
+        vbo = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, quad.nbytes, quad, GL.GL_STATIC_DRAW)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+        klass._quadBuffers[id(ctx)] = vbo
+        return vbo
 
     def paint(self):
-        if self.image is None \
+        if self.__key is None \
            or self.view() is None:
             return
 
-        # load image from file if needed
-        if self.__qimage is None:
-            self.__qimage = QtGui.QImage()
-            if not self.__qimage.load(self.image):
-                print(f"Error: Could not load image at {self.image}")
-                return
-            self.__qimage = self.__qimage.scaled(self.width, self.height,
-                                                 Qt.AspectRatioMode.KeepAspectRatio,
-                                                 Qt.TransformationMode.SmoothTransformation)
-                    
-        self.setupGLState()
-
-        project = self.compute_projection()
-        vec3 = QtGui.QVector3D(*self.pos)
-        text_pos = project.map(vec3).toPointF()
+        if not image_cache.ready(self.__key):
+            # still decoding, draw once it's done rather than wait
+            QtCore.QTimer.singleShot(16, self.update)
+            return
 
-        painter = QtGui.QPainter(self.view())
-        painter.drawImage(text_pos, self.__qimage)
-        painter.end()
+        texture = image_cache.texture(self.__key)
+        if texture is None:
+            return
+        texture, width, height = texture
 
-    def compute_projection(self):
-        # note that QRectF.bottom() != QRect.bottom()
-        rect = QtCore.QRectF(self.view().rect())
-        ndc_to_viewport = QtGui.QMatrix4x4()
-        ndc_to_viewport.viewport(rect.left(), rect.bottom(), rect.width(), -rect.height())
-        return ndc_to_viewport * self.mvpMatrix()
+        self.setupGLState()
 
+        mat_mvp = np.array(self.mvpMatrix().data(), dtype=np.float32)
+
+        # quad size in normalized device coordinates
+        view = self.view()
+        size = (2.0 * width / view.width(), 2.0 * height / view.height())
+
+        program = self.getShaderProgram()
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.getQuadBuffer())
+        GL.glVertexAttribPointer(0, 4, GL.GL_FLOAT, False, 4*4, None)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        GL.glEnableVertexAttribArray(0)
+
+        GL.glBindTexture(GL.GL_TEXTURE_2D, texture)
+
+        with program:
+            GL.glUniformMatrix4fv(GL.glGetUniformLocation(program, "u_mvp"), 1, False, mat_mvp)
+            GL.glUniform3f(GL.glGetUniformLocation(program, "u_anchor"), *(float(v) for v in self.pos))
+            GL.glUniform2f(GL.glGetUniformLocation(program, "u_size"), *size)
+
+            GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, 4)
+
+        GL.glDisableVertexAttribArray(0)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+
+
+# the anchor is projected, then the quad is offset in screen space,
+# i.e. by the offset in normalized device coordinates times w
+BILLBOARD_SHADER_LEGACY = {
+    GL.GL_VERTEX_SHADER : """
+        uniform mat4 u_mvp;
+        uniform vec3 u_anchor;
+        uniform vec2 u_size;
+        attribute vec4 a_position;
+        varying vec2 v_texcoord;
+        void main() {
+            vec4 anchor = u_mvp * vec4(u_anchor, 1.0);
+            vec2 offset = vec2(a_position.x, -a_position.y) * u_size;
+            gl_Position = anchor + vec4(offset * anchor.w, 0.0, 0.0);
+            v_texcoord = a_position.zw;
+        }
+    """,
+    GL.GL_FRAGMENT_SHADER : """
+        #ifdef GL_ES
+        precision mediump float;
+        #endif
+        uniform sampler2D u_texture;
+        varying vec2 v_texcoord;
+        void main()
+        {
+            gl_FragColor = texture2D(u_texture, v_texcoord);
+        }
+    """,
+}
+
+BILLBOARD_SHADER_CORE = {
+    GL.GL_VERTEX_SHADER : """
+        uniform mat4 u_mvp;
+        uniform vec3 u_anchor;
+        uniform vec2 u_size;
+        in vec4 a_position;
+        out vec2 v_texcoord;
+        void main() {
+            vec4 anchor = u_mvp * vec4(u_anchor, 1.0);
+            vec2 offset = vec2(a_position.x, -a_position.y) * u_size;
+            gl_Position = anchor + vec4(offset * anchor.w, 0.0, 0.0);
+            v_texcoord = a_position.zw;
+        }
+    """,
+    GL.GL_FRAGMENT_SHADER : """
+        #ifdef GL_ES
+        precision mediump float;
+        #endif
+        uniform sampler2D u_texture;
+        in vec2 v_texcoord;
+        out vec4 fragColor;
+        void main()
+        {
+            fragColor = texture(u_texture, v_texcoord);
+        }
+    """,
+}
+
+
+class MyDashedLineItem(gl.GLGraphicsItem.GLGraphicsItem):
+    """Dashed line from start to end
+
+    The dashes are built from the origin along end - start and moved to start
+    by the transform of the line plot, so moving the line without changing
+    its direction, length, dashes or color only updates that transform.
+    """
 
-class MyDashedLineItem(gl.GLGraphicsItem.GLGraphicsItem):    
     def __init__(self, parentItem=None, antialias=True, glOptions='opaque', **kwds):
         super().__init__()
 
@@ -465,6 +1245,7 @@ class MyDashedLineItem(gl.GLGraphicsItem.GLGraphicsItem):
         self.end = [1.0,1.0,1.0]
         self.dash_len = 0.25
         self.space_len = 0.25
+        self.__dashes_key = None
         
         self.setData(**kwds)
         
@@ -490,8 +1271,8 @@ class MyDashedLineItem(gl.GLGraphicsItem.GLGraphicsItem):
                 value = kwds[arg]
                 if arg == 'start' or arg == 'end':
                     if isinstance(value, np.ndarray):
-                        if value.shape != (3,1):
-                            raise ValueError('"start/end.shape" must be (3,1).')
+                        if value.shape != (3,):
+                            raise ValueError('"start/end.shape" must be (3,).')
                     elif isinstance(value, (tuple, list)):
                         if len(value) != 3:
                             raise ValueError('"len(start/end)" must be 3.')
@@ -507,30 +1288,33 @@ class MyDashedLineItem(gl.GLGraphicsItem.GLGraphicsItem):
             # still initializing
             return
 
-        ### axis lines
         start = np.array(self.start, dtype=np.float32)
-        end = np.array(self.end, dtype=np.float32)
-        mag = np.linalg.norm(end - start)
-        norm_vec = (end-start)/mag
-        count = int(np.ceil(mag / (self.dash_len + self.space_len)))
-        
-        pos = []
-        cur_pos = np.array(start)        
-        for _ in range(0,count+1):
-            pos.append(cur_pos)
-            next_pos = self.dash_len * norm_vec + cur_pos
-            if np.all(next_pos > end):
-                next_pos = end
-                pos.append(end)
-            else:
-                pos.append(next_pos)
-            cur_pos = self.space_len * norm_vec + next_pos
-
-        color = np.array(self.color, dtype=np.float32)
-        color = np.tile(color, len(pos)*2).reshape((-1, 4))   
-        pos = np.array(pos, dtype=np.float32).reshape((-1, 3))
-        
-        self.lineplot.setData(pos=pos, color=color)
+        vec = np.array(self.end, dtype=np.float32) - start
+
+        # only rebuild the dashes if more than their position changed
+        key = (tuple(vec), self.dash_len, self.space_len, tuple(self.color))
+        if key != self.__dashes_key:
+            pos = dash_vertices(vec, self.dash_len, self.space_len)
+            self.lineplot.setVisible(len(pos) > 0)
+            if len(pos) > 0:
+                self.lineplot.setData(pos=pos, color=tuple(self.color))
+            self.__dashes_key = key
+
+        self.lineplot.resetTransform()
+        self.lineplot.translate(*start)
         
         #####
         self.update()
+
+
+def dash_vertices(vec, dash_len, space_len):
+    """(2*n,3) float32 end points of the dashes of a line from the origin to vec, for mode='lines'"""
+    mag = np.linalg.norm(vec)
+    if mag == 0:
+        return np.zeros((0,3), dtype=np.float32)
+
+    # distances along the line of the start and end of every dash
+    starts = np.arange(0.0, mag, dash_len + space_len)
+    ends = np.minimum(starts + dash_len, mag)
+    t = np.column_stack((starts, ends)).ravel() / mag
+    return (t[:,None] * vec).astype(np.float32)
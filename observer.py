@@ -1,15 +1,15 @@
 import inspect
+import threading
 import weakref
 
+from pyqtgraph.Qt import QtCore
+
 class Observable:
     """Broadcasts a notification to a registry of function objects
 
 ----------------------------------------------------------------
 TODO
 
-* Not thread-safe
-  * self.observers needs protection
-* Currently only supports 'bound methods'. Do we need support for lambdas etc?
 * What happens if both a SuperClass and a SubClass register the same function 
   * e.g. SubClass.init() and SuperClass.init() both register some function
   * Does it receive two notifications?
@@ -23,9 +23,13 @@ Notes
   * https://docs.python.org/3/library/weakref.html#weakref.WeakMethod
 
 * Threading
+  * The registry is protected by a lock, observers are called outside of it
   * The notification will be broadcast on the thread calling notify
   * If notify occurs on a background, GUI elements will need make sure
-    that updates are performed on the main/UI thread
+    that updates are performed on the main/UI thread, see EventBus
+
+* Observers are called with (observable, user_data), (observable) or ()
+  depending on how many parameters they take, counted once at registration
 
 ----------------------------------------------------------------
 How memory leaks and seg faults are prevented
@@ -37,6 +41,7 @@ If an Observer object is 'deleted', what happens to the reference contained in O
 * If Observable holds a weak reference, upon 'deleting' the Observer,
   the Observer is dealloc and the reference is now invalid (potential seg fault)
   *** The weakref module lets us check if the object has been dealloc
+  *** Dead references are skipped and pruned, never called
 
 * If Observable holds a strong reference, upon 'deleting' the Observer,
   the reference will remain valid and Observer will never dealloc.
@@ -45,41 +50,128 @@ If an Observer object is 'deleted', what happens to the reference contained in O
 """
     def __init__(self):
         self.observers = []
+        self._lock = threading.Lock()
 
     def register_observer(self, func):
         """Add a function to the notification registry
 
-        func: a bound method, i.e. method of a class with alloc'd instance
+        func: a bound method, i.e. method of a class with alloc'd instance,
+              or a plain function, both are held by weak reference
         """
-        # check if already registered
-        if func in self.observers:
-            return
+        with self._lock:
+            # check if already registered
+            if self._find(func) is not None:
+                return
 
-        # add to registry
-        self.observers.append(weakref.WeakMethod(func))
+            if hasattr(func, '__self__'):
+                ref = weakref.WeakMethod(func)
+            else:
+                ref = weakref.ref(func)
+
+            # add to registry with the parameter count
+            self.observers.append((ref, len(inspect.signature(func).parameters)))
 
     def unregister_observer(self, func):
         """Removes a function from the notification registry"""
-        self.observers.remove(func)
+        with self._lock:
+            entry = self._find(func)
+            if entry is not None:
+                self.observers.remove(entry)
+
+    def _find(self, func):
+        for entry in self.observers:
+            if entry[0]() == func:
+                return entry
+        return None
         
     def notify_observers(self, user_data=None):
         """Notify all observers"""
+        self._broadcast(user_data)
+
+    def _broadcast(self, user_data):
+        with self._lock:
+            observers = list(self.observers)
+
         will_prune = []
-        for ref in self.observers:
+        for entry in observers:
+            ref, nargs = entry
             func = ref()
             if func is None:
                 # the object has been dealloc
-                will_prune.append(ref)
+                will_prune.append(entry)
+                continue
 
             # notify
-            if len(inspect.signature(func).parameters) > 1:
+            if nargs > 1:
                 func(self, user_data)
-            elif len(inspect.signature(func).parameters) > 0:
+            elif nargs > 0:
                 func(self)
             else:
                 func()
                 
         # remove dealloc'd references
-        for ref in will_prune:
-            self.observers.remove(ref)
-      
+        if len(will_prune) > 0:
+            with self._lock:
+                for entry in will_prune:
+                    if entry in self.observers:
+                        self.observers.remove(entry)
+
+
+class _MainThreadDispatcher(QtCore.QObject):
+    """Runs a function on the Qt main thread after a delay, however often it is requested"""
+    requested = QtCore.Signal()
+
+    def __init__(self, func, interval, restart):
+        super().__init__()
+        # deliver on the thread of the application, whoever emits
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            self.moveToThread(app.thread())
+
+        self.restart = restart
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(func)
+        self.requested.connect(self._onRequested)
+
+    def _onRequested(self):
+        if self.restart or not self.timer.isActive():
+            self.timer.start()
+
+
+class EventBus(Observable):
+    """Observable that delivers on the Qt main thread and coalesces bursts
+
+    notify_observers() may be called from any thread and returns at once.  All
+    notifications within frame_interval milliseconds of the first are merged
+    into one, delivered with the latest user_data.  With a debounce window,
+    delivery instead waits until no notification arrived for debounce
+    milliseconds, e.g. for text boxes edited a keystroke at a time.
+
+    Observers are held by weak reference like Observable.  A QApplication must
+    exist before the first notification is delivered.
+    """
+    def __init__(self, frame_interval=16, debounce=None):
+        super().__init__()
+        self.__pending = None
+        self.__has_pending = False
+        self.__dispatcher = _MainThreadDispatcher(self._flush,
+                                                  interval=frame_interval if debounce is None else debounce,
+                                                  restart=debounce is not None)
+
+    def notify_observers(self, user_data=None):
+        """Queue a notification, superseding the queued one"""
+        with self._lock:
+            self.__pending = user_data
+            self.__has_pending = True
+        self.__dispatcher.requested.emit()
+
+    def _flush(self):
+        with self._lock:
+            if not self.__has_pending:
+                return
+            user_data = self.__pending
+            self.__pending = None
+            self.__has_pending = False
+        self._broadcast(user_data)
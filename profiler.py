@@ -0,0 +1,192 @@
+import csv
+import time
+from collections import deque
+import functools
+
+import numpy as np
+
+class FrameProfiler:
+    """Times the phases of every frame, labelled by chapter and part
+
+    Phases
+      update    BaseWidget.updateScene, i.e. Segment.updateScene
+      prep      time spent in the setData/setMeshData of GL items, part of update,
+                i.e. preparing their arrays on the CPU, the GL buffers are
+                uploaded later by paint
+      paint     GLViewWidget.paintGL
+
+    While disabled nothing is wrapped or recorded, the only cost is the
+    enabled check in BaseWidget.updateScene and MyGLViewWidget.paintGL.
+
+    rows keeps the last max_rows frames for dumpCsv(), the older ones are
+    dropped, so a long session doesn't grow without bound.
+    """
+    PHASES = ('update', 'prep', 'paint')
+
+    def __init__(self, history=240, max_rows=36000):
+        self.enabled = False
+        self.history = history
+        # 10 minutes at 60 fps
+        self.rows = deque(maxlen=max_rows)
+
+        self.__rolling = {p: deque(maxlen=history) for p in self.PHASES}
+        self.__paint_times = deque(maxlen=history)
+        self.__frame = None
+        self.__frame_count = 0
+        self.__wrapped = []
+        self.__depth = 0
+
+    def enable(self, prep_methods=()):
+        """
+        prep_methods is a list of (class, method name) pairs, e.g.
+        (GLLinePlotItem, 'setData'), timed as the prep phase while enabled
+        """
+        if self.enabled:
+            return
+        self.enabled = True
+        for cls, name in prep_methods:
+            original = cls.__dict__[name]
+            setattr(cls, name, self._timed(original))
+            self.__wrapped.append((cls, name, original))
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.endFrame()
+        self.enabled = False
+        for cls, name, original in self.__wrapped:
+            setattr(cls, name, original)
+        self.__wrapped = []
+
+    def _timed(self, method):
+        profiler = self
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwds):
+            # nested calls, e.g. MyVectorFieldItem -> GLLinePlotItem, count once
+            profiler.__depth += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwds)
+            finally:
+                profiler.__depth -= 1
+                if profiler.__depth == 0:
+                    profiler.add('prep', time.perf_counter() - start)
+        return wrapper
+
+    def beginFrame(self, chapter, part):
+        self.endFrame()
+        self.__frame = {'frame': self.__frame_count,
+                        'time': time.monotonic(),
+                        'chapter': chapter,
+                        'part': part}
+        for p in self.PHASES:
+            self.__frame[p] = 0.0
+        self.__frame_count += 1
+
+    def endFrame(self):
+        if self.__frame is None:
+            return
+        for p in self.PHASES:
+            self.__rolling[p].append(self.__frame[p])
+        self.rows.append(self.__frame)
+        self.__frame = None
+
+    def add(self, phase, seconds):
+        if self.__frame is not None:
+            self.__frame[phase] += seconds * 1000
+
+    def markPaint(self, seconds):
+        self.__paint_times.append(time.monotonic())
+        self.add('paint', seconds)
+
+    def fps(self):
+        if len(self.__paint_times) < 2:
+            return 0.0
+        span = self.__paint_times[-1] - self.__paint_times[0]
+        return (len(self.__paint_times) - 1) / span if span > 0 else 0.0
+
+    def percentiles(self, phase, q=(50, 95)):
+        """Rolling percentiles of phase in milliseconds"""
+        values = self.__rolling[phase]
+        if len(values) == 0:
+            return [0.0 for _ in q]
+        return list(np.percentile(np.fromiter(values, float), q))
+
+    def summary(self):
+        """One line per phase for the HUD"""
+        label = ''
+        if len(self.rows) > 0:
+            label = f"Chapter {self.rows[-1]['chapter']} - Part {self.rows[-1]['part']}  "
+        lines = [f'{label}{self.fps():.1f} fps']
+        for p in self.PHASES:
+            p50, p95 = self.percentiles(p)
+            lines.append(f'{p:<7} p50 {p50:6.2f} ms  p95 {p95:6.2f} ms')
+        return lines
+
+    def dumpCsv(self, path):
+        self.endFrame()
+        fields = ['frame', 'time', 'chapter', 'part'] + [f'{p}_ms' for p in self.PHASES]
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for row in self.rows:
+                writer.writerow([row['frame'], row['time'], row['chapter'], row['part']] +
+                                [row[p] for p in self.PHASES])
+        return len(self.rows)
+
+    def reset(self):
+        self.rows.clear()
+        for p in self.PHASES:
+            self.__rolling[p].clear()
+        self.__paint_times.clear()
+
+
+class StartupProfile:
+    """Wall time of each startup phase, from main.py starting to the first frame on screen
+
+    Phases are marked in order, each one lasting from the previous mark.  The
+    marks are always recorded, they are only printed when enabled, i.e. with
+    --startup-profile.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.phases = []
+        self.finished = False
+        self.__start = time.perf_counter()
+        self.__last = self.__start
+
+    def begin(self, start):
+        """start is the perf_counter() at the top of main.py, before its imports"""
+        self.__start = start
+        self.__last = start
+
+    def mark(self, phase):
+        if self.finished:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.__last) * 1000))
+        self.__last = now
+
+    def finish(self, phase):
+        """Marks the last phase and prints the report if enabled"""
+        if self.finished:
+            return
+        self.mark(phase)
+        self.finished = True
+        if self.enabled:
+            print('\n'.join(self.report()))
+
+    def report(self):
+        total = (self.__last - self.__start) * 1000
+        lines = ['Startup']
+        for phase, ms in self.phases:
+            lines.append(f'  {phase:<16} {ms:8.1f} ms')
+        lines.append(f'  {"total":<16} {total:8.1f} ms')
+        return lines
+
+
+# shared by the widgets and BaseWidget
+profiler = FrameProfiler()
+startup = StartupProfile()
@@ -0,0 +1,167 @@
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtGui
+
+
+def frame_to_rgba(image):
+    """QImage from grabFramebuffer() as an (h,w,4) uint8 RGBA array, no compression"""
+    image = image.convertToFormat(QtGui.QImage.Format.Format_RGBA8888)
+    # copy, the array would otherwise point into the QImage's buffer
+    return np.array(pg.functions.ndarray_from_qimage(image), copy=True)
+
+
+class FfmpegFrameSink:
+    """Pipes raw RGBA frames into an ffmpeg subprocess"""
+
+    def __init__(self, path, width, height, fps):
+        self.path = path
+        self.frame_count = 0
+        self.process = subprocess.Popen(
+            ['ffmpeg', '-y', '-loglevel', 'error',
+             '-f', 'rawvideo', '-pix_fmt', 'rgba',
+             '-s', f'{width}x{height}', '-r', str(fps),
+             '-i', '-',
+             '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+             path],
+            stdin=subprocess.PIPE
+        )
+
+    def write(self, rgba):
+        self.process.stdin.write(memoryview(rgba))
+        self.frame_count += 1
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f'ffmpeg exited with code {self.process.returncode} while encoding {self.path}')
+
+
+class RawFrameSink:
+    """Appends raw RGBA frames to a single file, used when no encoder is installed"""
+
+    def __init__(self, path, width, height, fps):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_count = 0
+        self.file = open(path, 'wb')
+
+    def write(self, rgba):
+        self.file.write(memoryview(rgba))
+        self.frame_count += 1
+
+    def close(self):
+        self.file.close()
+
+    def encodeCommand(self, output='out.mp4'):
+        return (f'ffmpeg -f rawvideo -pix_fmt rgba -s {self.width}x{self.height} -r {self.fps} '
+                f'-i {self.path} -c:v libx264 -pix_fmt yuv420p {output}')
+
+
+def open_frame_sink(path, width, height, fps):
+    """An ffmpeg sink writing to path if ffmpeg is installed, otherwise a raw frame file next to it"""
+    if shutil.which('ffmpeg') is not None:
+        return FfmpegFrameSink(path, width, height, fps)
+
+    raw_path = path.rsplit('.', 1)[0] + '.rgba'
+    return RawFrameSink(raw_path, width, height, fps)
+
+
+def render_offscreen(widget, sink, frame_count):
+    """
+    Steps the widget's fixed step timer and streams each rendered frame to sink
+
+    widget       BaseWidget built with the 'manual' clock
+    sink         from open_frame_sink()
+    frame_count  number of frames to render
+
+    Labels are decoded in the background, every frame waits for them so the
+    output is the same on every run.
+    """
+    from my_widgets import MyGLImageItem
+
+    items = list(widget.canvas.items)
+    while items:
+        item = items.pop()
+        if isinstance(item, MyGLImageItem):
+            item.waitForImage()
+        items.extend(item.childItems())
+
+    for _ in range(frame_count):
+        # restartAnimation() replaces the timer, e.g. Part3 looping
+        widget.timer.step()
+
+        image = widget.canvas.grabFramebuffer()
+        if image.isNull():
+            raise RuntimeError('Could not render a frame, is an OpenGL context available? '
+                               'Without a display run under a virtual X server, e.g. xvfb-run -a')
+
+        sink.write(frame_to_rgba(image))
+
+
+class BackgroundFrameWriter:
+    """Saves grabbed frames from a bounded thread pool so the GUI thread never encodes images
+
+    At most max_pending frames wait to be written.  When the queue is full new
+    frames are dropped and counted, rather than stalling the animation, unless
+    submit() is asked to block, e.g. for single snapshots.
+    """
+
+    def __init__(self, max_workers=2, max_pending=8):
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self.__lock = threading.Lock()
+        self.__slots = threading.BoundedSemaphore(max_pending)
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers,
+                                             thread_name_prefix='frame-writer')
+
+    def submit(self, image, path, block=False):
+        """
+        Queues image, a QImage, to be saved at path.  The format follows the extension
+
+        Returns False if the frame was dropped because the queue was full
+        """
+        if not self.__slots.acquire(blocking=block):
+            with self.__lock:
+                self.dropped += 1
+            return False
+
+        self.__executor.submit(self._save, image, path)
+        return True
+
+    def _save(self, image, path):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            ok = image.save(path)
+            with self.__lock:
+                if ok:
+                    self.written += 1
+                else:
+                    self.failed += 1
+            if not ok:
+                print(f"Error: Could not save image at {path}")
+        finally:
+            self.__slots.release()
+
+    def close(self, wait=True):
+        self.__executor.shutdown(wait=wait)
+
+
+def next_take_directory(root='video'):
+    """First video/take_N directory that doesn't exist yet"""
+    n = 1
+    while os.path.exists(os.path.join(root, f'take_{n}')):
+        n += 1
+    return os.path.join(root, f'take_{n}')
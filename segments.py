@@ -1,29 +1,259 @@
 from abc import ABC
 from my_widgets import *
+from buffers import reserve, indices
 import numpy as np
 import pyqtgraph.opengl as gl
 
 class Settings:
+    graph_step = 0.05
+    lod = True                 # pick the graph step per frame, see graph_step()
+    lod_error_px = 0.5         # largest distance, in pixels, of a graph from the true curve
+    max_graph_vertices = 2000
+    max_arrows = 256           # arrows of a train in view, see arrow_train()
+
     @staticmethod
     def graphStep():
         '''When generating graphs, the distance between consectutive data points
 
         For example, the electric field, this would adjust dz
+        Used as is when lod is off, else it is the finest step graph_step() picks
         '''
-        return 0.05
+        return Settings.graph_step
+
+def field_item(w, style, color):
+    '''(w.pool key, factory) of a MyVectorFieldItem'''
+    return ((MyVectorFieldItem, style),
+            lambda: MyVectorFieldItem(parentItem=w.axes,
+                                      color=color))
+
+def graph_item(w, style, color, field='E'):
+    '''(w.pool key, factory) of a WaveCurveItem of field'''
+    return ((WaveCurveItem, style),
+            lambda: WaveCurveItem(field=field,
+                                  parentItem=w.axes,
+                                  color=color,
+                                  width=3.0,
+                                  antialias=True,
+                                  mode='line_strip'))
+
+def e_vector_item(w):
+    '''(w.pool key, factory) of the E vector of Parts 1-3'''
+    return ((MyVectorItem, 'e'),
+            lambda: MyVectorItem(parentItem=w.axes,
+                                 color=[1,0,0,1]))
+
+def observer_item(w):
+    '''(w.pool key, factory) of the observer sphere of Part 3'''
+    def build_observer():
+        point_md = gl.MeshData.sphere(10, 10, radius = 0.2)
+        return gl.GLMeshItem(
+            parentItem=w.axes,
+            meshdata=point_md,
+            color=[0.0,0.0,1.0,1.0],
+            smooth=False,
+            computeNormals=False,
+            glOptions='opaque'
+        )
+    return ((gl.GLMeshItem, 'observer'), build_observer)
+
+def observer_line_item(w):
+    '''(w.pool key, factory) of the dashed line of the observer of Part 3'''
+    return ((MyDashedLineItem, 'observer'),
+            lambda: MyDashedLineItem(parentItem=w.axes))
+
+def extrema_planes_item(w):
+    '''(w.pool key, factory) of the extremum planes of Part 4'''
+    return ((gl.GLMeshItem, 'extrema'),
+            lambda: gl.GLMeshItem(parentItem=w.axes,
+                                  smooth=True,
+                                  computeNormals=False,
+                                  glOptions='translucent'))
+
+def acquire_field(w, style, color):
+    '''MyVectorFieldItem from w.pool, cleared of the vectors of its previous segment'''
+    field = w.pool.acquire(*field_item(w, style, color))
+    field.setData(start=np.zeros((0,3)), end=np.zeros((0,3)), color=color)
+    return field
+
+def acquire_graph(w, style, color, field='E'):
+    '''WaveCurveItem of field from w.pool, cleared of the curve of its previous segment'''
+    graph = w.pool.acquire(*graph_item(w, style, color, field))
+    graph.clear()
+    return graph
+
+def graph_step(w):
+    '''Distance between the samples of the graphs of w, picked from freq, the axes and the camera
+
+    Between samples h apart, the chord of A cos(k z) strays at most
+    A k^2 h^2 / 8 from the curve, k is at most wave.maxFreq().  The step is the largest keeping that
+    under Settings.lod_error_px pixels at the camera's center, with at least
+    8 samples per wavelength, rounded down to a quarter octave so the grid
+    only changes with the level, then bounded by Settings.graphStep() and
+    Settings.max_graph_vertices.
+    '''
+    finest = Settings.graphStep()
+    if not Settings.lod:
+        return finest
+
+    wave = w.wave
+    amplitude = wave.amplitude()
+    pixel = w.canvas.pixelSize(w.canvas.opts['center'])
+    tolerance = Settings.lod_error_px * pixel
+
+    k = wave.maxFreq()
+    step = 2*np.pi / k / 8
+    if amplitude > 0:
+        step = min(step, np.sqrt(8 * tolerance / amplitude) / k)
+    step = 2 ** (np.floor(np.log2(step) * 4) / 4)
+    return float(max(step, finest, (w.axes.z_max - w.axes.z_min) / Settings.max_graph_vertices))
+
+def graph_grid(w):
+    '''z samples of the graphs, their number is kept in w.graph_vertices for the HUD'''
+    zs = w.wave.grid(w.axes.z_min, w.axes.z_max, graph_step(w))
+    w.graph_vertices = len(zs)
+    return zs
+
+def visible_z_range(w, margin):
+    '''
+    (z_lo, z_hi), the part of the z-axis of w.axes where a point within
+    margin of the axis in x and y may be in view, None if none may be
+    '''
+    lo, hi = w.axes.z_min, w.axes.z_max
+    for a_x, a_y, a_z, d in w.canvas.frustumPlanes(w.axes):
+        # largest a.p + d with |x|, |y| <= margin
+        c = d + margin * (abs(a_x) + abs(a_y))
+        if a_z > 1e-12:
+            lo = max(lo, -c / a_z)
+        elif a_z < -1e-12:
+            hi = min(hi, -c / a_z)
+        elif c < 0:
+            return None
+    return (lo, hi) if lo <= hi else None
+
+def arrow_train(w, dz, count, shift, margin, limit=None, out=None):
+    '''
+    z of the arrows in view of a train of count arrows dz apart along the z-axis
+
+    Arrow k is at z_min + (dz*(k+1) + shift) mod (z_max - z_min), only
+    arrows k < limit are in the train if limit is given.  Arrows outside
+    visible_z_range(w, margin) are skipped, then every stride-th arrow is
+    kept so at most Settings.max_arrows remain.
+
+    The z are written to out if it's given and large enough, see reserve()
+    '''
+    if limit is not None:
+        count = min(count, limit)
+    visible = visible_z_range(w, margin)
+    if count <= 0 or visible is None:
+        return np.zeros(0)
+
+    span = w.axes.z_max - w.axes.z_min
+    a = visible[0] - w.axes.z_min
+    b = visible[1] - w.axes.z_min
+    u = shift % span
+
+    # the train wraps once, after arrow k_wrap - 1
+    # the arrows in view are a range of k before and a range after wrapping
+    k_wrap = max(0, int(np.ceil((span - u) / dz - 1)))
+    runs = []
+    for offset, k_min, k_max in ((u, 0, min(count, k_wrap) - 1),
+                                 (u - span, k_wrap, count - 1)):
+        k_lo = max(k_min, int(np.ceil((a - offset) / dz - 1)))
+        k_hi = min(k_max, int(np.floor((b - offset) / dz - 1)))
+        if k_lo <= k_hi:
+            runs.append((offset, k_lo, k_hi))
+
+    # decimate by arrow, so the kept arrows don't change from frame to frame
+    total = sum(k_hi - k_lo + 1 for _, k_lo, k_hi in runs)
+    stride = max(1, int(np.ceil(total / Settings.max_arrows)))
+
+    if out is None or len(out) < total:
+        out = np.empty(total)
+    n = 0
+    for offset, k_lo, k_hi in runs:
+        k_lo = -(-k_lo // stride) * stride
+        if k_lo > k_hi:
+            continue
+        m = (k_hi - k_lo) // stride + 1
+        # z = z_min + offset + dz*(k+1), k = k_lo, k_lo + stride, ...
+        run = out[n:n+m]
+        np.multiply(indices(m), dz * stride, out=run)
+        run += w.axes.z_min + offset + dz*(k_lo + 1)
+        n += m
+    return out[:n]
+
+def axis_points(z, out=None):
+    '''Points on the z-axis, i.e. the tails of field vectors sampled at z, written to out if given'''
+    if out is None:
+        out = np.empty((np.size(z),3))
+    out[:,:2] = 0.0
+    out[:,2] = z
+    return out
+
+def fixed_step(w):
+    '''Whether the clock of w ticks at multiples of w.interval'''
+    return w.clock in ('fixed', 'manual')
 
 class Segment(ABC):
     def __init__(self, segment_number):
         self.segment_num = segment_number
+        self.buffers = {}
+
+    def buffer(self, name, rows, row_shape=(), dtype=np.float32):
+        '''First rows rows of the buffer name of this segment, reused from frame to frame, see reserve()'''
+        self.buffers[name] = reserve(self.buffers.get(name), rows, row_shape, dtype)
+        return self.buffers[name][:rows]
     
     def setupScene(self, w):
         pass
 
+    def poolItems(self, w):
+        '''[(key, factory)] of the w.pool items setupScene() acquires, see ItemPool.prepare()'''
+        return []
+
     def tearDownScene(self, w):
         pass
 
     def updateScene(self, w, t):
         pass
+
+    def axesChanged(self, w):
+        '''Called after the axes ranges change while the segment animates'''
+        pass
+
+    def waveTime(self, t):
+        '''Time the wave is shown at, at animation time t, e.g. for WaveField.setFreq()'''
+        return t
+
+    def periodicBuilds(self, w, wave):
+        '''{name: build(t)} of the frames of this segment that are periodic in t
+
+        Builds only read wave and the axes ranges
+        '''
+        return {}
+
+    def cacheKey(self, w, name, wave):
+        '''Everything the periodic frame name of this segment depends on besides t'''
+        return (self.segment_num, name, type(wave).__name__, wave.key(),
+                w.axes.x_min, w.axes.x_max,
+                w.axes.y_min, w.axes.y_max,
+                w.axes.z_min, w.axes.z_max,
+                Settings.graphStep())
+
+    def periodicFrame(self, w, t, name):
+        '''
+        Periodic frame name at t, built once per wave period and replayed from
+        w.frame_cache.  Only the fixed step clocks tick at multiples of
+        w.interval, with the wall and vsync clocks every frame is built.
+        '''
+        build = self.periodicBuilds(w, w.wave)[name]
+        period = w.wave.period()
+        if period is None or not fixed_step(w):
+            return build(t)
+        return w.frame_cache.frame(self.cacheKey(w, name, w.wave), t,
+                                   period=period,
+                                   step=w.interval / 1000,
+                                   build=build)
     
 class Part1(Segment):
     def __init__(self):
@@ -39,10 +269,9 @@ class Part1(Segment):
         # theres apparently a bug in pyqtgraph
         # that depth value is working like in earlier versions
         # move the vector slightly off the origin for better drawing
-        self.e_vec = MyVectorItem(parentItem=w.axes,
-                                  color=[1,0,0,1],
-                                  start=[0.0,0.0,0.05],
-                                  end=[w.magnitude,0.0,0.05])
+        self.e_vec = w.pool.acquire(*e_vector_item(w))
+        self.e_vec.setPosition(start=[0.0,0.0,0.05],
+                               end=[w.wave.magnitude,0.0,0.05])
         self.e_vec.setDepthValue(5)
 
 
@@ -50,21 +279,23 @@ class Part1(Segment):
         w.axes.setData(z_visible=False,
                        x_tick_plane=1)
         
+    def poolItems(self, w):
+        return [e_vector_item(w)]
+
     def tearDownScene(self, w):
-        # remove e_vec from scene
-        self.e_vec.setParentItem(None)
-        w.canvas.removeItem(self.e_vec)
+        # return e_vec to the pool
+        w.pool.release(self.e_vec)
         self.e_vec = None
 
         # undo invisibility changes
         w.axes.setData(z_visible=True,
                        x_tick_plane=2)
                 
+    def periodicBuilds(self, w, wave):
+        return {'e': lambda t: wave.components(wave.phase(t))}
+
     def updateScene(self, w, t):
-        x = w.magnitude * np.cos(w.freq*t)
-        y = 0.0
-        if w.chapter > 1:
-            y = w.magnitude * np.cos(w.freq*t + w.phase_diff)
+        x, y = self.periodicFrame(w, t, 'e')
         
         self.e_vec.setPosition(start=[0.0,0.0,0.05],
                                end=[x,y,0.05])
@@ -83,24 +314,24 @@ class Part2(Segment):
         # theres apparently a bug in pyqtgraph
         # that depth value is working like in earlier versions
         # move the vector slightly off the origin for better drawing
-        self.e_vec = MyVectorItem(parentItem=w.axes,
-                                  color=[1,0,0,1],
-                                  start=[0.0,0.0,0.05],
-                                  end=[w.magnitude,0.0,0.05])
+        self.e_vec = w.pool.acquire(*e_vector_item(w))
+        self.e_vec.setPosition(start=[0.0,0.0,0.05],
+                               end=[w.wave.magnitude,0.0,0.05])
         self.e_vec.setDepthValue(5)
 
+    def poolItems(self, w):
+        return [e_vector_item(w)]
+
     def tearDownScene(self, w):
-        # remove e_vec from scene
-        self.e_vec.setParentItem(None)
-        w.canvas.removeItem(self.e_vec)
+        # return e_vec to the pool
+        w.pool.release(self.e_vec)
         self.e_vec = None
         
-    def updateScene(self, w, t):
-        x = w.magnitude * np.cos(w.freq*t)
-        y = 0.0
-        if w.chapter > 1:
-            y = w.magnitude * np.cos(w.freq*t + w.phase_diff)
+    def periodicBuilds(self, w, wave):
+        return {'e': lambda t: wave.components(wave.phase(t))}
 
+    def updateScene(self, w, t):
+        x, y = self.periodicFrame(w, t, 'e')
         
         self.e_vec.setPosition(start=[0.0,0.0,0.05],
                                end=[x,y,0.05])
@@ -133,44 +364,38 @@ class Part3(Segment):
                                    azimuth=110)
 
         # e vector
-        self.e_vec = MyVectorItem(parentItem=w.axes,
-                                  color=[1,0,0,1],
-                                  start=[0.0,0.0,0.0],
-                                  end=[w.magnitude,0.0,0.0])
+        self.e_vec = w.pool.acquire(*e_vector_item(w))
+        self.e_vec.setPosition(start=[0.0,0.0,0.0],
+                               end=[w.wave.magnitude,0.0,0.0])
         self.e_vec.setDepthValue(5)
 
 
         # observer
-        point_md = gl.MeshData.sphere(10, 10, radius = 0.2)
-        self.observer = gl.GLMeshItem(
-                parentItem=w.axes,
-                meshdata=point_md,
-                color=[0.0,0.0,1.0,1.0],
-                smooth=False,
-                computeNormals=False,
-                glOptions='opaque'
-            )
+        self.observer = w.pool.acquire(*observer_item(w))
+        self.observer.resetTransform()
         
         # dashed line
-        self.ob_line = MyDashedLineItem(parentItem=w.axes,
-                                        start=[0.0, w.axes.y_max, 0.0],
-                                        end=[0.0, w.axes.y_min, 0.0])
+        self.ob_line = w.pool.acquire(*observer_line_item(w))
+        self.ob_line.setData(start=[0.0, w.axes.y_max, 0.0],
+                             end=[0.0, w.axes.y_min, 0.0])
         self.ob_line.setDepthValue(4)
 
+    def poolItems(self, w):
+        return [e_vector_item(w),
+                observer_item(w),
+                observer_line_item(w)]
+
     def tearDownScene(self, w):
-        # remove e_vec from scene
-        self.e_vec.setParentItem(None)
-        w.canvas.removeItem(self.e_vec)
+        # return e_vec to the pool
+        w.pool.release(self.e_vec)
         self.e_vec = None
         
-        # remove observer from scene
-        self.observer.setParentItem(None)
-        w.canvas.removeItem(self.observer)
+        # return observer to the pool
+        w.pool.release(self.observer)
         self.observer = None
         
-        # remove e_vec from scene
-        self.ob_line.setParentItem(None)
-        w.canvas.removeItem(self.ob_line)
+        # return ob_line to the pool
+        w.pool.release(self.ob_line)
         self.ob_line = None
         
     def updateScene(self, w, t):
@@ -178,10 +403,10 @@ class Part3(Segment):
         z = linear_scale(x2=w.axes.z_max,
                          y2=duration,
                          y=t)
-        x = w.magnitude
+        x = w.wave.magnitude
         y = 0.0
-        if w.chapter > 1:
-            y = w.magnitude
+        if w.wave.polarized:
+            y = w.wave.ratio * w.wave.magnitude
         
         self.e_vec.setPosition(start=[0.0,0.0,z],
                                end=[x,y,z])
@@ -197,6 +422,12 @@ class Part3(Segment):
 
 
 class Part4(Segment):
+    UP_COLOR = np.array([1.0,0.0,0.0,1.0], dtype=np.float32)
+    DOWN_COLOR = np.array([0.0,0.0,1.0,1.0], dtype=np.float32)
+    UP_PLANE_COLOR = np.array([1.0,0.0,0.0,100/255], dtype=np.float32)
+    DOWN_PLANE_COLOR = np.array([0.0,0.0,1.0,100/255], dtype=np.float32)
+    QUAD_FACES = np.array([[0,1,2],[0,2,3]], dtype=np.uint32)
+
     def __init__(self):
         super().__init__(4)
     
@@ -207,210 +438,89 @@ class Part4(Segment):
                                    elevation=10,
                                    azimuth=110)
 
-        self.up_planes = []
-        self.down_planes = []
-        self.up_vecs = []
-        self.down_vecs = []
+        # extremum planes, one quad each
+        self.planes = w.pool.acquire(*extrema_planes_item(w))
+        self.planes.setMeshData(vertexes=np.zeros((0,3)), faces=np.zeros((0,3), dtype=np.uint32))
+        self.planes.setDepthValue(5)
+        self.plane_faces = None
+
+        # extremum vectors, maxima and minima in one batch
+        self.vecs = acquire_field(w, 'extrema', self.UP_COLOR)
+        self.vecs.setDepthValue(6)
         
         # e graph
-        self.graph = gl.GLLinePlotItem(parentItem=w.axes,
-                                       pos=[0.0,0.0,0.0],
-                                       color=[1.0,0.0,0.0,1.0],
-                                       width=3.0,
-                                       antialias=True,
-                                       mode='line_strip')
+        self.graph = acquire_graph(w, 'e', [1.0,0.0,0.0,1.0])
+        self.graph.setDepthValue(0)
         
         
+    def poolItems(self, w):
+        return [extrema_planes_item(w),
+                field_item(w, 'extrema', self.UP_COLOR),
+                graph_item(w, 'e', [1.0,0.0,0.0,1.0])]
+
     def tearDownScene(self, w):
-        # remove e graph from scene
-        self.graph.setParentItem(None)
-        w.canvas.removeItem(self.graph)
+        # return e graph to the pool
+        w.pool.release(self.graph)
         self.graph = None
 
-        # remove up vecs
-        for v in self.up_vecs:
-            v.setParentItem(None)
-            w.canvas.removeItem(v)
-        self.up_vecs = []
-        
-        # remove down vecs
-        for v in self.down_vecs:
-            v.setParentItem(None)
-            w.canvas.removeItem(v)
-        self.down_vecs = []
-
-        # remove up planes
-        for v in self.up_planes:
-            v.setParentItem(None)
-            w.canvas.removeItem(v)
-        self.up_planes = []
-        
-        # remove down plane
-        for v in self.down_planes:
-            v.setParentItem(None)
-            w.canvas.removeItem(v)
-        self.down_planes = []
+        # return extremum vecs to the pool
+        w.pool.release(self.vecs)
+        self.vecs = None
+
+        # return planes to the pool
+        w.pool.release(self.planes)
+        self.planes = None
+
+
+    def planeMesh(self, w, zs, up):
+        """Vertexes, faces and vertex colors of a quad per extremum, spanning x and y <= 0"""
+        k = len(zs)
+        x0, x1 = w.axes.x_min, w.axes.x_max
+        y0, y1 = w.axes.y_min, 0.0
+
+        vertexes = self.buffer('plane_vertexes', k, (4,3))
+        vertexes[:,0,:2] = x0, y0
+        vertexes[:,1,:2] = x1, y0
+        vertexes[:,2,:2] = x1, y1
+        vertexes[:,3,:2] = x0, y1
+        vertexes[:,:,2] = zs[:,None]
+
+        # the faces of the first k quads, valid for any k up to the capacity
+        capacity = self.buffers['plane_vertexes'].shape[0]
+        if self.plane_faces is None or self.plane_faces.shape[0] != 2*capacity:
+            offsets = 4*np.arange(capacity, dtype=np.uint32)[:,None,None]
+            self.plane_faces = (self.QUAD_FACES[None,:,:] + offsets).reshape((-1,3))
+
+        colors = self.buffer('plane_colors', k, (4,4))
+        colors[:] = self.DOWN_PLANE_COLOR
+        np.copyto(colors, self.UP_PLANE_COLOR, where=up[:,None,None])
+        return vertexes.reshape((-1,3)), self.plane_faces[:2*k], colors.reshape((-1,4))
 
-        
     def updateScene(self, w, t):
-        # graph
-        zs = np.arange(w.axes.z_min, w.axes.z_max+Settings.graphStep(), Settings.graphStep())
-        data = np.zeros((zs.size,3))
-        data[:,2] = zs
-        data[:,0] = w.magnitude * np.cos(w.freq*data[:,2] - w.freq*t)
-        if w.chapter > 1:
-            data[:,1] = w.magnitude * np.cos(w.freq*data[:,2] - w.freq*t + w.phase_diff)
-           
-        self.graph.setData(pos=data)
-
-        # find first minumim
-        # this will be located at some z<=axes.z_min
-        n = np.floor(w.freq / np.pi * (w.axes.z_min - t))
-        if n % 2 == 0:
-            n -= 1
-
-        # vector and plane
-        cur_z = np.pi*n/w.freq + t
-
-        up_vec_idx = -1
-        down_vec_idx = -1
-        new_up_vecs = []
-        new_down_vecs = []
-
-        up_plane_idx = -1
-        down_plane_idx = -1
-        new_up_planes = []
-        new_down_planes = []
-
-        # draw elements least n first
-        depth = 5
-
-        # loop through valid values of n
-        while cur_z < w.axes.z_max:
-            # check if in bounds of graph
-            if cur_z >= w.axes.z_min and cur_z <= w.axes.z_max:
-                if n % 2 == 0:
-                    # maximum
-                    up_vec_idx += 1
-                    up_plane_idx += 1
-                    
-                    # get vector
-                    vec = None
-                    if up_vec_idx < len(self.up_vecs):
-                        vec = self.up_vecs[up_vec_idx]
-                    else:
-                        vec = MyVectorItem(parentItem=w.axes,
-                                           color=[1,0,0,1])
-                        new_up_vecs.append(vec)
-                        
-                    # mod vector
-                    x = w.magnitude * np.cos(w.freq*cur_z - w.freq*t)
-                    y = 0.0
-                    if w.chapter > 1:
-                        y = w.magnitude * np.cos(w.freq*cur_z - w.freq*t + w.phase_diff)
-                    
-                    vec.setVisible(True)
-                    vec.setPosition(start=[0.0,0.0,cur_z],
-                                    end=[x,y,cur_z])
-                    vec.setDepthValue(depth+1)
-
-                    # get plane
-                    plane = None
-                    if up_plane_idx < len(self.up_planes):
-                        plane = self.up_planes[up_plane_idx]
-                    else:
-                        image_data = np.array([[[255,0,0,100]]], dtype=np.ubyte)
-                        plane = gl.GLImageItem(image_data,
-                                               parentItem=w.axes)
-                        
-                        new_up_planes.append(plane)
-                        
-                    # mod plane
-                    plane.setVisible(True)
-                    plane.resetTransform()
-                    plane.scale(w.axes.x_max - w.axes.x_min,
-                                0 - w.axes.y_min,
-                                1)
-                    plane.translate(w.axes.x_min, w.axes.y_min, cur_z)
-                    plane.setDepthValue(depth)
-                    
-                else:
-                    # minimum
-                    down_vec_idx += 1
-                    down_plane_idx += 1
-                    
-                    # get vector
-                    vec = None
-                    if down_vec_idx < len(self.down_vecs):
-                        vec = self.down_vecs[down_vec_idx]
-                    else:
-                        vec = MyVectorItem(parentItem=w.axes,
-                                           color=[0,0,1,1])
-                        new_down_vecs.append(vec)
-                        
-                    # mod vector
-                    x = w.magnitude * np.cos(w.freq*cur_z - w.freq*t)
-                    y = 0.0
-                    if w.chapter > 1:
-                        y = w.magnitude * np.cos(w.freq*cur_z - w.freq*t + w.phase_diff)
-                    
-                    vec.setVisible(True)
-                    vec.setPosition(start=[0.0,0.0,cur_z],
-                                    end=[x,y,cur_z])
-                    vec.setDepthValue(depth+1)
-                    
-                    # get plane
-                    plane = None
-                    if down_plane_idx < len(self.down_planes):
-                        plane = self.down_planes[down_plane_idx]
-                    else:
-                        image_data = np.array([[[0,0,255,100]]], dtype=np.ubyte)
-                        plane = gl.GLImageItem(image_data,
-                                               parentItem=w.axes)
-                        
-                        new_down_planes.append(plane)
-                        
-                    # mod plane
-                    plane.setVisible(True)
-                    plane.resetTransform()
-                    plane.scale(w.axes.x_max - w.axes.x_min,
-                                0 - w.axes.y_min,
-                                1)
-                    plane.translate(w.axes.x_min, w.axes.y_min, cur_z)
-                    plane.setDepthValue(depth)
-
-                    
-            # loop condition        
-            n += 1
-            cur_z = np.pi*n/w.freq + t
-            depth += 2
-
-        #
-        # update vector and plane cache
-        #
-        # up vecs
-        for v in new_up_vecs:
-            self.up_vecs.append(v)
-        for i in range(up_vec_idx+1, len(self.up_vecs)):
-            self.up_vecs[i].setVisible(False)
-        # down vecs
-        for v in new_down_vecs:
-            self.down_vecs.append(v)
-        for i in range(down_vec_idx+1, len(self.down_vecs)):
-            self.down_vecs[i].setVisible(False)
-        # up planes
-        for v in new_up_planes:
-            self.up_planes.append(v)
-        for i in range(up_plane_idx+1, len(self.up_planes)):
-            self.up_planes[i].setVisible(False)
-        # down planes
-        for v in new_down_planes:
-            self.down_planes.append(v)
-        for i in range(down_plane_idx+1, len(self.down_planes)):
-            self.down_planes[i].setVisible(False)
+        # extrema of E_1 within the axes, ordered by z, at the t of the graph
+        zs, up = w.wave.extrema(w.axes.z_min, w.axes.z_max, t)
+        n = len(zs)
+
+        self.graph.setWave(w.wave, graph_grid(w), t)
+
+        # vectors
+        colors = self.buffer('colors', n, (4,))
+        colors[:] = self.DOWN_COLOR
+        np.copyto(colors, self.UP_COLOR, where=up[:,None])
+        self.vecs.setData(start=axis_points(zs, out=self.buffer('start', n, (3,))),
+                          end=w.wave.E(zs, t, out=self.buffer('end', n, (3,))),
+                          color=colors)
+
+        # planes, drawn least z first
+        vertexes, faces, colors = self.planeMesh(w, zs, up)
+        self.planes.setMeshData(vertexes=vertexes, faces=faces, vertexColors=colors)
 
             
 class Part5(Segment):
+    # the wave stands still while the arrows and the graph are introduced
+    pt_1_dur = 5.0
+    pt_2_dur = 2.0
+
     def __init__(self):
         super().__init__(5)
     
@@ -422,104 +532,78 @@ class Part5(Segment):
                                    azimuth=110)
 
 
-        self.e_vecs = []
         self.dz = 0.25
-        count = int(np.floor((w.axes.z_max-w.axes.z_min)/self.dz))
-        for _ in range(0,count):
-            vec = MyVectorItem(parentItem=w.axes,
-                               color=[1,0,0,1],
-                               start=[0.0,0.0,0.0],
-                               end=[w.magnitude,0.0,0.0])
-            self.e_vecs.append(vec)
+        self.axesChanged(w)
+        self.e_vecs = acquire_field(w, 'e', [1,0,0,1])
+        self.e_vecs.setDepthValue(0)
         
         # e graph
-        self.e_graph = gl.GLLinePlotItem(parentItem=w.axes,
-                                         pos=[0.0,0.0,0.0],
-                                         color=[1.0,0.0,0.0,1.0],
-                                         width=3.0,
-                                         antialias=True,
-                                         mode='line_strip')
+        self.e_graph = acquire_graph(w, 'e', [1.0,0.0,0.0,1.0])
         self.e_graph.setDepthValue(5)
 
         
 
+    def axesChanged(self, w):
+        self.count = int(np.floor((w.axes.z_max-w.axes.z_min)/self.dz))
+
+    def margin(self, w):
+        '''Distance from the z-axis the arrows may reach'''
+        return w.wave.amplitude() + self.e_vecs.tip_radius
+
+    def poolItems(self, w):
+        return [field_item(w, 'e', [1,0,0,1]),
+                graph_item(w, 'e', [1.0,0.0,0.0,1.0])]
+
     def tearDownScene(self, w):
-        # remove e_graph from scene
-        self.e_graph.setParentItem(None)
-        w.canvas.removeItem(self.e_graph)
+        # return e_graph to the pool
+        w.pool.release(self.e_graph)
         self.e_graph = None
 
-        # remove e_vecs
-        for v in self.e_vecs:
-            v.setParentItem(None)
-            w.canvas.removeItem(v)
-        self.e_vecs = []
+        # return e_vecs to the pool
+        w.pool.release(self.e_vecs)
+        self.e_vecs = None
 
         
+    def waveTime(self, t):
+        return max(t - self.pt_1_dur - self.pt_2_dur, 0.0)
+
     def updateScene(self, w, t):
-        pt_1_dur = 5.0
-        pt_2_dur = 2.0
+        pt_1_dur = self.pt_1_dur
+        pt_2_dur = self.pt_2_dur
 
         if t <= pt_1_dur:
             # part 1
             # show sampled z one by one
             self.e_graph.setVisible(False)
 
-            dt = pt_1_dur / len(self.e_vecs)
-            for idx, vec in enumerate(self.e_vecs):
-                z = self.dz*(idx+1) + w.axes.z_min
-                x = w.magnitude * np.cos(w.freq*z)
-                y = 0.0
-                if w.chapter > 1:
-                    y = w.magnitude * np.cos(w.freq*z + w.phase_diff)
-
-                vec.setPosition(start=[0.0,0.0,z],
-                                end=[x,y,z])
-                vec.setVisible(idx*dt < t)
+            # vecs revealed so far, i.e. idx*dt < t
+            dt = pt_1_dur / self.count
+            shown = min(self.count, int(np.ceil(t / dt)))
+
+            z = arrow_train(w, self.dz, self.count, 0.0, self.margin(w), limit=shown,
+                            out=self.buffer('z', self.count))
+            self.e_vecs.setData(start=axis_points(z, out=self.buffer('start', len(z), (3,))),
+                                end=w.wave.E(z, 0.0, out=self.buffer('e', len(z), (3,))))
         elif t <= pt_1_dur + pt_2_dur:
             # part 2
             # show e graph
-            zs = np.arange(w.axes.z_min, w.axes.z_max+Settings.graphStep(), Settings.graphStep())
-            data = np.zeros((zs.size,3))
-            data[:,2] = zs
-            data[:,0] = w.magnitude * np.cos(w.freq*data[:,2])
-            if w.chapter > 1:
-                data[:,1] = w.magnitude * np.cos(w.freq*data[:,2] + w.phase_diff)
-
-            
-            self.e_graph.setData(pos=data)
+            self.e_graph.setWave(w.wave, graph_grid(w), 0.0)
             self.e_graph.setVisible(True)
         else:
             # part 3
             # animate
-            t -= pt_1_dur + pt_2_dur
+            t = self.waveTime(t)
 
             # vecs
-            for idx, vec in enumerate(self.e_vecs):
-                # z = n*dz+ct (c=1) then confine to visible z-axis
-                z = self.dz*(idx+1) + t
-                z = z % (w.axes.z_max - w.axes.z_min)
-                z += w.axes.z_min
-                
-                x = w.magnitude * np.cos(w.freq*z - w.freq*t)
-                y = 0.0
-                if w.chapter > 1:
-                    y = w.magnitude * np.cos(w.freq*z - w.freq*t + w.phase_diff)
-
-                vec.setPosition(start=[0.0,0.0,z],
-                                end=[x,y,z])
+            # z = n*dz+ct (c=1) then confine to visible z-axis
+            z = arrow_train(w, self.dz, self.count, t, self.margin(w),
+                            out=self.buffer('z', self.count))
 
+            self.e_vecs.setData(start=axis_points(z, out=self.buffer('start', len(z), (3,))),
+                                end=w.wave.E(z, t, out=self.buffer('e', len(z), (3,))))
 
             # e_graph
-            zs = np.arange(w.axes.z_min, w.axes.z_max+Settings.graphStep(), Settings.graphStep())
-            data = np.zeros((zs.size,3))
-            data[:,2] = zs
-            data[:,0] = w.magnitude * np.cos(w.freq*data[:,2] - w.freq*t)
-            if w.chapter > 1:
-                data[:,1] = w.magnitude * np.cos(w.freq*data[:,2] - w.freq*t + w.phase_diff)
-
-
-            self.e_graph.setData(pos=data)
+            self.e_graph.setWave(w.wave, graph_grid(w), t)
 
 class Part6(Segment):
     def __init__(self):
@@ -533,132 +617,85 @@ class Part6(Segment):
                                    azimuth=110)
 
 
-        self.e_vecs = []
-        self.b_vecs = []
         self.dz = 0.25
-        count = int(np.floor((w.axes.z_max-w.axes.z_min)/self.dz))
-        for _ in range(0,count):
-            vec = MyVectorItem(parentItem=w.axes,
-                               color=[1,0,0,1],
-                               start=[0.0,0.0,0.0],
-                               end=[w.magnitude,0.0,0.0])
-            self.e_vecs.append(vec)
-
-            
-            vec = MyVectorItem(parentItem=w.axes,
-                               color=[0,1,0,1],
-                               start=[0.0,0.0,0.0],
-                               end=[w.magnitude,0.0,0.0])
-            self.b_vecs.append(vec)
+        self.axesChanged(w)
+        self.e_vecs = acquire_field(w, 'e', [1,0,0,1])
+        self.e_vecs.setDepthValue(0)
+        self.b_vecs = acquire_field(w, 'b', [0,1,0,1])
+        self.b_vecs.setDepthValue(0)
         
         # e graph
-        self.e_graph = gl.GLLinePlotItem(parentItem=w.axes,
-                                         pos=[0.0,0.0,0.0],
-                                         color=[1.0,0.0,0.0,1.0],
-                                         width=3.0,
-                                         antialias=True,
-                                         mode='line_strip')
+        self.e_graph = acquire_graph(w, 'e', [1.0,0.0,0.0,1.0])
         self.e_graph.setDepthValue(5)
 
         # b graph
-        self.b_graph = gl.GLLinePlotItem(parentItem=w.axes,
-                                         pos=[0.0,0.0,0.0],
-                                         color=[0.0,1.0,0.0,1.0],
-                                         width=3.0,
-                                         antialias=True,
-                                         mode='line_strip')
+        self.b_graph = acquire_graph(w, 'b', [0.0,1.0,0.0,1.0], field='B')
         self.b_graph.setDepthValue(4)
         
 
+    def axesChanged(self, w):
+        self.count = int(np.floor((w.axes.z_max-w.axes.z_min)/self.dz))
+
+    def margin(self, w):
+        '''Distance from the z-axis the arrows may reach'''
+        return w.wave.amplitude() + self.e_vecs.tip_radius
+
+    def poolItems(self, w):
+        return [field_item(w, 'e', [1,0,0,1]),
+                field_item(w, 'b', [0,1,0,1]),
+                graph_item(w, 'e', [1.0,0.0,0.0,1.0]),
+                graph_item(w, 'b', [0.0,1.0,0.0,1.0], field='B')]
+
     def tearDownScene(self, w):
-        # remove e_graph from scene
-        self.e_graph.setParentItem(None)
-        w.canvas.removeItem(self.e_graph)
+        # return e_graph to the pool
+        w.pool.release(self.e_graph)
         self.e_graph = None
 
-        # remove e_vecs
-        for v in self.e_vecs:
-            v.setParentItem(None)
-            w.canvas.removeItem(v)
-        self.e_vecs = []
+        # return e_vecs to the pool
+        w.pool.release(self.e_vecs)
+        self.e_vecs = None
 
-        # remove b_graph from scene
-        self.b_graph.setParentItem(None)
-        w.canvas.removeItem(self.b_graph)
+        # return b_graph to the pool
+        w.pool.release(self.b_graph)
         self.b_graph = None
 
-        # remove b_vecs
-        for v in self.b_vecs:
-            v.setParentItem(None)
-            w.canvas.removeItem(v)
-        self.b_vecs = []
+        # return b_vecs to the pool
+        w.pool.release(self.b_vecs)
+        self.b_vecs = None
 
         
     def updateScene(self, w, t):
         # e vecs
-        for idx, vec in enumerate(self.e_vecs):
-            # z = n*dz+ct (c=1) then confine to visible z-axis
-            z = self.dz*(idx+1) + t
-            z = z % (w.axes.z_max - w.axes.z_min)
-            z += w.axes.z_min
-
-            x = w.magnitude * np.cos(w.freq*z - w.freq*t)
-            y = 0.0
-            if w.chapter > 1:
-                y = w.magnitude * np.cos(w.freq*z - w.freq*t + w.phase_diff)
-
-            vec.setPosition(start=[0.0,0.0,z],
-                            end=[x,y,z])
-            
-            
-        # e_graph
-        zs = np.arange(w.axes.z_min, w.axes.z_max+Settings.graphStep(), Settings.graphStep())
-        data = np.zeros((zs.size,3))
-        data[:,2] = zs
-        data[:,0] = w.magnitude * np.cos(w.freq*data[:,2] - w.freq*t)
-        if w.chapter > 1:
-            data[:,1] = w.magnitude * np.cos(w.freq*data[:,2] - w.freq*t + w.phase_diff)
+        # z = n*dz+ct (c=1) then confine to visible z-axis
+        z = arrow_train(w, self.dz, self.count, t, self.margin(w),
+                        out=self.buffer('z', self.count))
+        n = len(z)
 
-        
-        self.e_graph.setData(pos=data)
+        e, b = w.wave.fields(z, t, out=(self.buffer('e', n, (3,)),
+                                        self.buffer('b', n, (3,))))
+        start = axis_points(z, out=self.buffer('start', n, (3,)))
+        self.e_vecs.setData(start=start, end=e)
 
         # b vecs
-        for idx, vec in enumerate(self.b_vecs):
-            # z = n*dz+ct (c=1) then confine to visible z-axis
-            z = self.dz*(idx+1) + t
-            z = z % (w.axes.z_max - w.axes.z_min)
-            z += w.axes.z_min
-
-            x = w.magnitude * np.cos(w.freq*z - w.freq*t)
-            y = 0.0
-            if w.chapter > 1:
-                y = w.magnitude * np.cos(w.freq*z - w.freq*t + w.phase_diff)
-
-            # rotate by 90 degrees
-            temp = x
-            x = -y
-            y = temp
-                
-            vec.setPosition(start=[0.0,0.0,z],
-                            end=[x,y,z])
-            
-            
-        # b_graph
-        zs = np.arange(w.axes.z_min, w.axes.z_max+Settings.graphStep(), Settings.graphStep())
-        data = np.zeros((zs.size,3))
-        
-        x = w.magnitude * np.cos(w.freq*zs - w.freq*t)
-        y = np.zeros(zs.size)
-        if w.chapter > 1:
-            y = w.magnitude * np.cos(w.freq*zs - w.freq*t + w.phase_diff)
-        
-        # rotate by 90 degrees
-        temp = x
-        x = -y
-        y = temp
-
-        data[:,0] = x 
-        data[:,1] = y
-        data[:,2] = zs
-                
-        self.b_graph.setData(pos=data)
+        self.b_vecs.setData(start=start, end=b)
+
+        # graphs
+        zs = graph_grid(w)
+        self.e_graph.setWave(w.wave, zs, t)
+        self.b_graph.setWave(w.wave, zs, t)
+
+
+# segment classes by part number
+SEGMENTS = {
+    1: Part1,
+    2: Part2,
+    3: Part3,
+    4: Part4,
+    5: Part5,
+    6: Part6,
+}
+
+def segment_class(segment_num):
+    if segment_num not in SEGMENTS:
+        raise ValueError(f'Unknown segment number {segment_num}')
+    return SEGMENTS[segment_num]
@@ -0,0 +1,127 @@
+'''Checks that steady-state frames of every Part allocate next to nothing
+
+Nothing is painted, see widget_helpers, so the graphs are evaluated on the
+CPU as WaveCurveItem.paint() would.  Each Part runs on large axes with every arrow in view, until its periodic frames
+are cached, then tracemalloc records the peak memory allocated on top of
+what is already held while more frames are drawn.
+
+The arrays of a few hundred arrows are smaller than the Python objects a
+frame allocates, so the test also checks that the per-frame buffers of the
+Part and of its graphs are the same arrays from frame to frame.
+
+  python test/allocation_test.py
+  python -m pytest test/allocation_test.py
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+from widget_helpers import build_widget
+
+import tracemalloc
+
+import numpy as np
+import pyqtgraph as pg
+
+# bytes a frame may allocate and free again, i.e. Python objects and small temporaries
+THRESHOLD_BYTES = 16 * 1024
+
+WARMUP_FRAMES = 100
+FRAMES = 50
+DT = 0.05
+
+# Part5 animates after its introduction
+START_TIMES = {5: 10.0}
+
+# Segment.buffers each Part fills every frame
+BUFFERS = {4: {'plane_vertexes', 'plane_colors', 'colors', 'start', 'end'},
+           5: {'z', 'start', 'e'},
+           6: {'z', 'start', 'e', 'b'}}
+
+
+def visible_graphs(w):
+    from my_widgets import WaveCurveItem
+
+    return [item for item in w.axes.childItems()
+            if isinstance(item, WaveCurveItem) and item.visible()]
+
+
+def draw_frame(w, graphs, t):
+    w.updateScene(t)
+    for graph in graphs:
+        graph.positions()
+
+
+def frame_allocations(w, part, chapter):
+    '''
+    (peak bytes allocated above the steady state while drawing FRAMES frames
+    of part, names of the per-frame buffers that were reallocated or missing)
+    '''
+    w.transitionTo(part, chapter)
+    w.stopAnimating()
+    # far enough for every arrow to be in view
+    w.canvas.setCameraPosition(distance=400)
+
+    t0 = START_TIMES.get(part, 0.0)
+    graphs = []
+    for i in range(WARMUP_FRAMES):
+        draw_frame(w, graphs, t0 + i*DT)
+        graphs = visible_graphs(w)
+
+    buffers = dict(w.segment.buffers)
+    positions = [graph.positions() for graph in graphs]
+
+    tracemalloc.start()
+    try:
+        # the first frame under tracemalloc sets up its bookkeeping
+        draw_frame(w, graphs, t0 + WARMUP_FRAMES*DT)
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        for i in range(WARMUP_FRAMES + 1, WARMUP_FRAMES + 1 + FRAMES):
+            draw_frame(w, graphs, t0 + i*DT)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    reallocated = sorted(BUFFERS.get(part, set()) - set(buffers))
+    reallocated += sorted(name for name, buf in buffers.items()
+                          if w.segment.buffers.get(name) is not buf)
+    reallocated += [f'{graph.field} graph' for graph, pos in zip(graphs, positions)
+                    if not np.shares_memory(graph.positions(), pos)]
+
+    return peak - base, reallocated
+
+
+def build_large_widget(chapter):
+    w = build_widget(chapter)
+
+    # hundreds of arrows and extrema
+    w.axes.setData(x_min=-100, x_max=100,
+                   y_min=-100, y_max=100,
+                   z_min=-100, z_max=100)
+    w.freq = 5.0
+    return w
+
+
+def test_steady_state_frames():
+    app = pg.mkQApp()
+
+    failures = []
+    for chapter in (1, 3, 4):
+        w = build_large_widget(chapter)
+        for part in range(1, 7):
+            allocated, reallocated = frame_allocations(w, part, chapter)
+            print(f'part{part}/ch{chapter}: {allocated} bytes')
+            if allocated > THRESHOLD_BYTES:
+                failures.append(f'part{part}/ch{chapter} allocated {allocated} bytes')
+            if reallocated:
+                failures.append(f'part{part}/ch{chapter} reallocated {", ".join(reallocated)}')
+        w.close()
+
+    assert not failures, ', '.join(failures)
+
+
+if __name__ == '__main__':
+    test_steady_state_frames()
+    print('ok')
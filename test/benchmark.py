@@ -0,0 +1,210 @@
+'''Headless benchmarks of every Part and the widget primitives
+
+Runs without a display on the Qt offscreen platform, nothing is painted, so
+a frame of a Part is its updateScene() plus the CPU evaluation of its visible
+graphs, as WaveCurveItem.paint() does where the wave shader is unavailable.
+
+  # save a baseline
+  python test/benchmark.py --output baseline.json
+
+  # compare against it, exits with 1 if any case is slower by more than --threshold
+  python test/benchmark.py --output new.json --compare baseline.json
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import argparse
+import itertools
+import json
+import platform
+import time
+
+import numpy as np
+import pyqtgraph as pg
+
+
+def stats(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        'count': int(samples.size),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'min_ms': float(samples.min()),
+    }
+
+
+def time_calls(func, count):
+    samples = np.empty(count)
+    for i in range(count):
+        start = time.perf_counter()
+        func(i)
+        samples[i] = time.perf_counter() - start
+    return samples
+
+
+def segment_cases(quick):
+    '''(part, chapter, freq, phase_diff, axes half-width, graph step)'''
+    freqs = [0.5, 5.0]
+    phases = [0.0, np.pi/2]
+    axes = [3.0, 20.0]
+    steps = [0.05, 0.01]
+    if quick:
+        freqs = freqs[:1]
+        axes = axes[:1]
+        steps = steps[:1]
+
+    for part, chapter in itertools.product(range(1, 7), [1, 3, 4]):
+        chapter_phases = phases if chapter == 3 else [0.0]
+        for freq, phase, half, step in itertools.product(freqs, chapter_phases, axes, steps):
+            yield part, chapter, freq, phase, half, step
+
+
+def draw_frame(w, t):
+    from my_widgets import WaveCurveItem
+
+    w.updateScene(t)
+    for item in w.axes.childItems():
+        if isinstance(item, WaveCurveItem) and item.visible():
+            item.positions()
+
+
+def bench_segments(ticks, quick, cache):
+    from main import BaseWidget, UserMode
+    from segments import Settings
+
+    results = {}
+    widgets = {}
+    # restored afterwards, Settings is shared by everything in the process
+    lod, graph_step = Settings.lod, Settings.graph_step
+    try:
+        for part, chapter, freq, phase, half, step in segment_cases(quick):
+            if chapter not in widgets:
+                widgets[chapter] = BaseWidget(start_segment=1,
+                                              start_chapter=chapter,
+                                              user_mode=UserMode.SIMULATION,
+                                              clock='manual',
+                                              prefetch=False)
+            w = widgets[chapter]
+            if not cache:
+                w.frame_cache.max_frames = 0
+            w.frame_cache.clear()
+
+            # scene settings used by setupScene
+            w.axes.setData(x_min=-half, x_max=half,
+                           y_min=-half, y_max=half,
+                           z_min=-half, z_max=half)
+            Settings.lod = False
+            Settings.graph_step = step
+            w.transitionTo(part, chapter)
+            w.stopAnimating()
+            w.freq = freq
+            w.phase_diff = phase
+
+            dt = w.interval / 1000
+            samples = time_calls(lambda i: draw_frame(w, i*dt), ticks)
+
+            key = f'part{part}/ch{chapter}/freq={freq:g}/phase={phase:.3f}/axes={half:g}/step={step:g}'
+            results[key] = stats(samples)
+            print(f"{key:<60} {results[key]['mean_ms']:8.3f} ms")
+    finally:
+        Settings.lod = lod
+        Settings.graph_step = graph_step
+
+    return results
+
+
+def bench_primitives(count):
+    from my_widgets import (generate_cone, rotations_from_z, MyVectorItem, MyVectorFieldItem,
+                            MyGLAxisItem, MyDashedLineItem)
+
+    rng = np.random.default_rng(0)
+    ends = rng.normal(size=(count, 3))
+    results = {}
+
+    vec = MyVectorItem()
+    def vector_update(i):
+        vec.end = ends[i]
+        vec.updateLines()
+    results['MyVectorItem.updateLines'] = stats(time_calls(vector_update, count))
+
+    field = MyVectorFieldItem()
+    field_ends = rng.normal(size=(100, 3))
+    field.setData(start=np.zeros((100, 3)), end=field_ends)
+    results['MyVectorFieldItem.updateLines/100'] = stats(time_calls(lambda i: field.updateLines(), count))
+
+    results['rotations_from_z/1000'] = stats(time_calls(lambda i: rotations_from_z(ends[:1000]), count))
+
+    axes = MyGLAxisItem(x_min=-3, x_max=3, y_min=-3, y_max=3, z_min=-3, z_max=3)
+    results['MyGLAxisItem.updateLines'] = stats(time_calls(lambda i: axes.updateLines(), count))
+
+    line = MyDashedLineItem(start=[0.0, 3.0, 0.0], end=[0.0, -3.0, 0.0])
+    results['MyDashedLineItem.updateLines'] = stats(time_calls(lambda i: line.updateLines(), count))
+
+    results['generate_cone'] = stats(time_calls(lambda i: generate_cone(0.15, 0.3, 8), count))
+
+    for key, value in results.items():
+        print(f"{key:<60} {value['mean_ms']:8.3f} ms")
+    return results
+
+
+def compare(results, baseline, threshold):
+    '''Cases whose mean is slower than the baseline by more than threshold, a fraction'''
+    regressions = []
+    for key, value in results.items():
+        old = baseline.get(key)
+        if old is None or old['mean_ms'] <= 0:
+            continue
+        ratio = value['mean_ms'] / old['mean_ms']
+        if ratio > 1.0 + threshold:
+            regressions.append((key, old['mean_ms'], value['mean_ms'], ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless benchmarks of the segments and widget primitives')
+    parser.add_argument('--output', default='benchmark.json', help='JSON results file (default: benchmark.json)')
+    parser.add_argument('--compare', metavar='BASELINE', default=None, help='JSON results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown against the baseline as a fraction (default: 0.2)')
+    parser.add_argument('--ticks', type=int, default=2000, help='Simulated ticks per segment case (default: 2000)')
+    parser.add_argument('--count', type=int, default=2000, help='Calls per primitive (default: 2000)')
+    parser.add_argument('--quick', action='store_true', help='Smaller parameter matrix')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the periodic frame cache')
+    args = parser.parse_args()
+
+    app = pg.mkQApp()
+
+    results = {}
+    results.update(bench_primitives(args.count))
+    results.update(bench_segments(args.ticks, args.quick, not args.no_cache))
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'meta': {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'pyqtgraph': pg.__version__,
+                'ticks': args.ticks,
+                'count': args.count,
+                'cache': not args.no_cache,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f'Wrote {len(results)} results to {args.output}')
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+        regressions = compare(results, baseline, args.threshold)
+        for key, old, new, ratio in regressions:
+            print(f'REGRESSION {key}: {old:.3f} ms -> {new:.3f} ms ({ratio:.2f}x)')
+        if len(regressions) > 0:
+            sys.exit(1)
+        print(f'No regressions against {args.compare}')
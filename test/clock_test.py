@@ -0,0 +1,69 @@
+'''Checks that the wall and vsync clocks show a new frame on every tick
+
+The frequency makes the wave period a whole number of 100 ms intervals, so
+frames would be cached at the interval if the clock was ignored.
+
+  python test/clock_test.py
+  python -m pytest test/clock_test.py
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+from widget_helpers import build_widget
+
+import numpy as np
+import pyqtgraph as pg
+
+# a display refresh, much shorter than the 100 ms interval
+DT = 1 / 60
+TICKS = 30
+
+# period 2 s, 20 intervals of 100 ms
+FREQ = np.pi
+
+
+def shown(w):
+    '''Copy of what the current Part shows that moves with the wave'''
+    if w.segment.segment_num in (1, 2):
+        return w.segment.e_vec.end.copy()
+    return w.segment.buffers['start'].copy()
+
+
+def frozen_ticks(w, part, chapter):
+    '''Ticks of part at which the shown frame didn't change'''
+    w.transitionTo(part, chapter)
+    w.stopAnimating()
+    w.freq = FREQ
+
+    frozen = []
+    w.updateScene(0.0)
+    previous = shown(w)
+    for i in range(1, TICKS):
+        w.updateScene(i * DT)
+        current = shown(w)
+        if np.array_equal(current, previous):
+            frozen.append(i)
+        previous = current
+    return frozen
+
+
+def test_vsync_ticks_show_new_frames():
+    app = pg.mkQApp()
+
+    failures = []
+    for chapter in (1, 4):
+        w = build_widget(chapter, clock='vsync', interval=100)
+        for part in (1, 2, 4):
+            frozen = frozen_ticks(w, part, chapter)
+            if frozen:
+                failures.append(f'part{part}/ch{chapter} repeated a frame at ticks {frozen}')
+        w.close()
+
+    assert not failures, ', '.join(failures)
+
+
+if __name__ == '__main__':
+    test_vsync_ticks_show_new_frames()
+    print('ok')
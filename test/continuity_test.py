@@ -0,0 +1,92 @@
+'''Checks that a frequency change mid animation doesn't make the wave jump
+
+Every Part animates on a manual clock, then the frequency slider moves.
+E_1 at z=0, as drawn by the Part, must be the same in the frames before
+and after the change, see widget_helpers for the setup.
+
+  python test/continuity_test.py
+  python -m pytest test/continuity_test.py
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+from widget_helpers import build_widget
+
+import numpy as np
+import pyqtgraph as pg
+
+# float32 vertex buffers
+TOLERANCE = 1e-4
+
+# animation times in seconds, Part5 animates after its introduction
+TIMES = (3.0, 10.0, 20.0)
+
+# slider positions, 0 to 1000 for 0.5 to 5.0
+FREQ_VALUES = (500, 100)
+
+
+def e_1_at_origin(w):
+    '''E_1 at z=0 as drawn by the current Part, by its E graph, E arrows or E vector'''
+    segment = w.segment
+    graph = getattr(segment, 'graph', None) or getattr(segment, 'e_graph', None)
+    if graph is not None and graph.visible():
+        tips = graph.positions()
+    elif getattr(segment, 'e_vecs', None) is not None:
+        tips = segment.e_vecs.end
+    else:
+        # Parts 1-3 draw E at z=0, Part 3 at any z shows a constant E
+        return segment.e_vec.end[0]
+
+    i = np.argmin(np.abs(tips[:,2]))
+    assert abs(tips[i,2]) < 1e-6, f'part{segment.segment_num} draws nothing at z=0'
+    return tips[i,0]
+
+
+def freq_jumps(w, part, chapter):
+    '''[(t, before, after)] of the frequency changes that moved E_1 at z=0'''
+    jumps = []
+    for t in TIMES:
+        w.transitionTo(part, chapter)
+        for _ in range(int(round(t * 1000 / w.interval))):
+            w.timer.step()
+        t = w.animationTime()
+
+        for val in FREQ_VALUES:
+            w.updateScene(t)
+            before = e_1_at_origin(w)
+            w.handleFreqChange(val)
+            w.updateScene(t)
+            after = e_1_at_origin(w)
+            if abs(after - before) > TOLERANCE:
+                jumps.append((t, before, after))
+    return jumps
+
+
+def test_freq_change_is_continuous():
+    from segments import Settings
+
+    app = pg.mkQApp()
+
+    # the graph samples z=0 whatever the frequency
+    lod = Settings.lod
+    Settings.lod = False
+    failures = []
+    try:
+        for chapter in (1, 3, 4):
+            w = build_widget(chapter)
+            for part in range(1, 7):
+                for t, before, after in freq_jumps(w, part, chapter):
+                    failures.append(f'part{part}/ch{chapter} at t={t:g}: E_1(0) {before:.3f} -> {after:.3f}')
+            w.stopAnimating()
+            w.close()
+    finally:
+        Settings.lod = lod
+
+    assert not failures, ', '.join(failures)
+
+
+if __name__ == '__main__':
+    test_freq_change_is_continuous()
+    print('ok')
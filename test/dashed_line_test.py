@@ -0,0 +1,79 @@
+'''Checks the dashes of MyDashedLineItem and that moving the line only moves its transform
+
+  python test/dashed_line_test.py
+  python -m pytest test/dashed_line_test.py
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+import pyqtgraph as pg
+
+from my_widgets import MyDashedLineItem, dash_vertices
+
+TOLERANCE = 1e-5
+
+DASH = 0.25
+SPACE = 0.25
+
+# e.g. the observer line of Part 3 runs from y_max to y_min
+VECS = [(0.0, -6.0, 0.0),
+        (0.0, 0.0, -6.0),
+        (0.0, -3.0, -4.0),
+        (1.0, 2.0, 2.0)]
+
+
+def test_dashes_follow_the_line():
+    failures = []
+    for vec in VECS:
+        vec = np.array(vec)
+        mag = np.linalg.norm(vec)
+        pos = dash_vertices(vec, DASH, SPACE)
+
+        # distance along the line and from it of every end point
+        along = pos @ vec / mag
+        off = np.linalg.norm(pos - along[:,None] * vec / mag, axis=1)
+        lengths = along[1::2] - along[::2]
+
+        expected_along = np.arange(0.0, mag, DASH + SPACE)
+        if len(pos) != 2 * len(expected_along):
+            failures.append(f'{tuple(vec)}: {len(pos) // 2} dashes, expected {len(expected_along)}')
+        elif np.abs(along[::2] - expected_along).max() > TOLERANCE:
+            failures.append(f'{tuple(vec)}: dashes start off the spacing')
+        if off.max() > TOLERANCE:
+            failures.append(f'{tuple(vec)}: end points {off.max():.3g} off the line')
+        if (lengths < -TOLERANCE).any() or (lengths > DASH + TOLERANCE).any() \
+           or along.max() > mag + TOLERANCE:
+            failures.append(f'{tuple(vec)}: dashes run backwards or past the end')
+
+    assert not failures, ', '.join(failures)
+
+
+def test_moving_the_line_only_translates():
+    app = pg.mkQApp()
+    line = MyDashedLineItem(start=[0.0, 3.0, 0.0], end=[0.0, -3.0, 0.0])
+
+    calls = []
+    set_data = line.lineplot.setData
+    line.lineplot.setData = lambda **kwds: calls.append(kwds) or set_data(**kwds)
+
+    # Part 3 moves the observer line along z, as it animates
+    for z in (0.5, 1.0, 1.5):
+        line.setData(start=[0.0, 3.0, z], end=[0.0, -3.0, z])
+        translation = np.array(line.lineplot.transform().map(pg.Vector(0, 0, 0)))
+        assert np.allclose(translation, [0.0, 3.0, z])
+    assert calls == []
+
+    # a new direction rebuilds the dashes
+    line.setData(end=[0.0, -3.0, 3.0])
+    assert len(calls) == 1
+
+
+if __name__ == '__main__':
+    test_dashes_follow_the_line()
+    test_moving_the_line_only_translates()
+    print('ok')
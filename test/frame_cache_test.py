@@ -0,0 +1,55 @@
+'''Checks that PeriodicFrameCache replays the frame of every timer tick
+
+  python test/frame_cache_test.py
+  python -m pytest test/frame_cache_test.py
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+
+from frame_cache import PeriodicFrameCache
+
+STEP = 0.1
+TICKS = 500
+
+
+def replay(period):
+    '''(frames at the ticks, times build was called) over TICKS ticks of STEP'''
+    cache = PeriodicFrameCache()
+    built = []
+
+    def build(t):
+        built.append(t)
+        return t % period
+
+    frames = [cache.frame('key', i*STEP, period=period, step=STEP, build=build)
+              for i in range(TICKS)]
+    return frames, built
+
+
+def test_whole_period_is_cached():
+    # 20 ticks
+    period = 2.0
+    frames, built = replay(period)
+
+    assert len(built) == 20
+    for i, frame in enumerate(frames):
+        assert abs(frame - (i*STEP) % period) < 1e-9
+
+
+def test_fractional_period_is_not_cached():
+    # 12.57 ticks, e.g. freq=5, cached frames would repeat or skip a tick
+    period = 1.2566370614359172
+    frames, built = replay(period)
+
+    assert len(built) == TICKS
+    for i, frame in enumerate(frames):
+        assert abs(frame - (i*STEP) % period) < 1e-9
+
+
+if __name__ == '__main__':
+    test_whole_period_is_cached()
+    test_fractional_period_is_not_cached()
+    print('ok')
@@ -1,16 +1,46 @@
+'''Checks that build_assets renders the labels of resources/labels.json
+
+The labels are rendered into a temporary directory, next to a copy of the
+manifest, so neither resources/ nor the working directory is touched.
+Needs matplotlib.
+
+  python test/latex_test.py
+  python -m pytest test/latex_test.py
+'''
 # local code
 import sys
 import os
 here = os.path.dirname(__file__)
 sys.path.append(os.path.join(here, '..'))
 
-from latex2image import *
+import shutil
+import tempfile
+
+from pyqtgraph.Qt import QtGui
+
+from build_assets import build, load_manifest
+
+MANIFEST = os.path.join(here, '..', 'resources', 'labels.json')
+
+
+def test_build_labels():
+    with tempfile.TemporaryDirectory() as out_dir:
+        manifest = os.path.join(out_dir, 'labels.json')
+        shutil.copy(MANIFEST, manifest)
+        outputs = sorted(label['output'] for label in load_manifest(manifest))
+
+        built, skipped = build(manifest, out_dir, jobs=2)
+        assert sorted(built) == outputs and skipped == []
+
+        for output in outputs:
+            image = QtGui.QImage(os.path.join(out_dir, output))
+            assert not image.isNull() and image.hasAlphaChannel(), output
+
+        # up to date, see labels.hashes.json
+        built, skipped = build(manifest, out_dir)
+        assert built == [] and sorted(skipped) == outputs
 
 
-#latex2image(r"$\vec{E}$", 'vec_e.png')
-#latex2image(r"$\vec{k}$", 'vec_k.png')
-latex2image(r"$\hat{E}_1$", 'hat_e_1.png', align_bottom=False)
-latex2image(r"$\hat{E}_2$", 'hat_e_2.png', align_bottom=False)
-latex2image(r"$\hat{k}$", 'hat_k.png')
-#latex2image(r"$\vec{E}\left(\vec{r},\right)=E_0 \cos\left(kz-\omega t\right)$", 'linear_polarization_eq.png', align_bottom=False)
-#latex2image(r"$foo_\phi$", 'foo.png', align_bottom=False)
+if __name__ == '__main__':
+    test_build_labels()
+    print('ok')
@@ -0,0 +1,112 @@
+'''Checks that EventBus coalesces, debounces and delivers on the main thread
+
+Notifications are delivered by Qt timers, the tests spin the event loop with
+QCoreApplication.processEvents() on the Qt offscreen platform.
+
+  python test/observer_test.py
+  python -m pytest test/observer_test.py
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import gc
+import threading
+import time
+
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtCore
+
+from observer import EventBus
+
+
+class Recorder:
+    def __init__(self):
+        self.received = []
+        self.threads = []
+
+    def onChange(self, observable, user_data):
+        self.received.append(user_data)
+        self.threads.append(threading.current_thread())
+
+
+def process_events(ms):
+    '''Runs the Qt event loop for ms milliseconds'''
+    deadline = time.monotonic() + ms / 1000
+    while time.monotonic() < deadline:
+        QtCore.QCoreApplication.processEvents()
+        time.sleep(0.001)
+
+
+def test_burst_is_coalesced():
+    app = pg.mkQApp()
+    bus = EventBus(frame_interval=16)
+    recorder = Recorder()
+    bus.register_observer(recorder.onChange)
+
+    for i in range(10):
+        bus.notify_observers(user_data=i)
+    assert recorder.received == []
+
+    process_events(200)
+    assert recorder.received == [9]
+
+
+def test_debounce_restarts_on_every_notification():
+    app = pg.mkQApp()
+    bus = EventBus(debounce=200)
+    recorder = Recorder()
+    bus.register_observer(recorder.onChange)
+
+    # a notification every 50 ms, 250 ms in total, each restarts the window
+    for i in range(6):
+        bus.notify_observers(user_data=i)
+        process_events(50)
+    assert recorder.received == []
+
+    process_events(400)
+    assert recorder.received == [5]
+
+
+def test_delivered_on_the_main_thread():
+    app = pg.mkQApp()
+    bus = EventBus(frame_interval=16)
+    recorder = Recorder()
+    bus.register_observer(recorder.onChange)
+
+    thread = threading.Thread(target=bus.notify_observers, kwargs=dict(user_data='background'))
+    thread.start()
+    thread.join()
+
+    process_events(200)
+    assert recorder.received == ['background']
+    assert recorder.threads == [threading.main_thread()]
+
+
+def test_dead_observers_are_pruned():
+    app = pg.mkQApp()
+    bus = EventBus(frame_interval=16)
+    recorder = Recorder()
+    bus.register_observer(recorder.onChange)
+
+    def onChange():
+        pass
+    bus.register_observer(onChange)
+    assert len(bus.observers) == 2
+
+    del recorder, onChange
+    gc.collect()
+    bus.notify_observers(user_data='late')
+    process_events(200)
+    assert bus.observers == []
+
+
+if __name__ == '__main__':
+    test_burst_is_coalesced()
+    test_debounce_restarts_on_every_notification()
+    test_delivered_on_the_main_thread()
+    test_dead_observers_are_pruned()
+    print('ok')
@@ -0,0 +1,64 @@
+'''Checks rotations_from_z_into, as MyVectorFieldItem places the arrow tips, against rotations_from_z
+
+The directions are normalized in float32 like MyVectorFieldItem.updateLines()
+does, so near -z their cosine rounds to -1.  Only the image of +z, the tip
+axis, has to match, the tips are symmetric about it.
+
+  python test/rotations_test.py
+  python -m pytest test/rotations_test.py
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+
+from my_widgets import rotations_from_z, rotations_from_z_into
+
+# float32 directions
+TOLERANCE = 1e-3
+
+# along and close to +z and -z, where 1+cos vanishes
+VECS = [(0.0, 0.0, 1.0),
+        (0.0, 0.0, -1.0),
+        (1e-4, 0.0, -1.0),
+        (0.0, -1e-4, -1.0),
+        (1e-3, 1e-3, -1.0),
+        (1e-2, 0.0, -1.0),
+        (0.1, 0.0, -1.0),
+        (1e-4, 0.0, 1.0),
+        (1.0, 0.0, 0.0)]
+
+
+def test_matches_rotations_from_z():
+    rng = np.random.default_rng(0)
+    vecs = np.vstack([VECS, rng.normal(size=(200, 3))])
+    n = len(vecs)
+
+    dirs = vecs.astype(np.float32)
+    dirs /= np.linalg.norm(dirs, axis=1)[:,None]
+    c = np.empty(n, dtype=np.float32)
+    k = np.empty(n, dtype=np.float32)
+    anti = np.empty(n, dtype=bool)
+    out = np.empty((n, 3, 3), dtype=np.float32)
+    rotations_from_z_into(dirs, c, k, anti, out)
+
+    expected = rotations_from_z(vecs)
+    failures = []
+    for vec, rot, exp in zip(vecs, out, expected):
+        axis_error = np.abs(rot[:,2] - exp[:,2]).max()
+        if axis_error > TOLERANCE:
+            failures.append(f'{tuple(vec)}: +z off by {axis_error:.3g}')
+        # a rotation or a reflection, nothing that stretches the tip
+        if np.abs(rot.T @ rot - np.eye(3)).max() > TOLERANCE:
+            failures.append(f'{tuple(vec)}: not orthogonal, max entry {np.abs(rot).max():.3g}')
+
+    assert not failures, ', '.join(failures)
+
+
+if __name__ == '__main__':
+    test_matches_rotations_from_z()
+    print('ok')
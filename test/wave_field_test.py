@@ -0,0 +1,111 @@
+'''Checks the fields of WaveField and SuperpositionField against fresh instances
+
+  python test/wave_field_test.py
+  python -m pytest test/wave_field_test.py
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+
+import numpy as np
+
+from wave_field import WaveField, SuperpositionField
+
+TOLERANCE = 1e-9
+
+# float32 vertex buffers, against float64
+FLOAT32_TOLERANCE = 1e-5
+
+# (z_min, z_max, step) in the order a session might show them, e.g. LOD
+# step changes, wider axes, and a shifted grid of the same length
+GRIDS = [(-3, 3, 0.05),
+         (-3, 3, 0.1),
+         (-6, 6, 0.05),
+         (-2, 4, 0.05),
+         (-3, 3, 0.05)]
+
+
+def test_superposition_grid_changes():
+    wave = SuperpositionField(SuperpositionField.squareWave(), freq=0.7)
+
+    failures = []
+    for i, (z_min, z_max, step) in enumerate(GRIDS):
+        t = 0.3 * i
+        zs = wave.grid(z_min, z_max, step)
+
+        fresh = SuperpositionField(SuperpositionField.squareWave(), freq=0.7)
+        expected = fresh.E(fresh.grid(z_min, z_max, step), t)
+
+        error = np.abs(wave.E(zs, t) - expected).max()
+        if error > TOLERANCE:
+            failures.append(f'grid {(z_min, z_max, step)} off by {error:.3g}')
+
+    assert not failures, ', '.join(failures)
+
+
+def test_square_wave():
+    # E_1 of enough harmonics, at t=0 theta = z
+    wave = SuperpositionField(SuperpositionField.squareWave(harmonics=50), magnitude=1.0, freq=1.0)
+
+    # away from the jumps at theta = +-pi/2
+    margin = 0.3
+    zs = np.linspace(-np.pi/2 + margin, np.pi/2 - margin, 200)
+    high = wave.E(zs, 0.0)[:,0]
+    low = wave.E(zs + np.pi, 0.0)[:,0]
+
+    assert np.abs(high - 1).max() < 0.05
+    assert np.abs(low + 1).max() < 0.05
+
+
+def sampled_extrema(wave, z_min, z_max, t, step=1e-4):
+    '''(zs, up) of the sign changes of the slope of E_1 on a fine grid'''
+    zs = np.arange(z_min, z_max, step)
+    slope = np.diff(wave.E(zs, t)[:,0])
+    i = np.flatnonzero(np.sign(slope[:-1]) != np.sign(slope[1:])) + 1
+    return zs[i], slope[i] < 0
+
+
+def test_extrema():
+    waves = {'single': WaveField(freq=4.7, polarized=True, ratio=0.5, phase_diff=1.0),
+             'square': SuperpositionField(SuperpositionField.squareWave(), freq=4.7),
+             'aperiodic': SuperpositionField([[1.0, 0.0, 1.0, 0.0],
+                                              [0.5, 0.0, np.sqrt(2), 0.3]], freq=4.7)}
+
+    failures = []
+    for name, wave in waves.items():
+        for t in (0.0, 1.3, 3600.7):
+            zs, up = wave.extrema(-3, 3, t)
+            expected_zs, expected_up = sampled_extrema(wave, -3, 3, t)
+            if len(zs) != len(expected_zs):
+                failures.append(f'{name} t={t:g}: {len(zs)} extrema, expected {len(expected_zs)}')
+                continue
+            error = np.abs(zs - expected_zs).max(initial=0.0)
+            if error > 1e-3 or not np.array_equal(up, expected_up):
+                failures.append(f'{name} t={t:g}: extrema off by {error:.3g}')
+
+    assert not failures, ', '.join(failures)
+
+
+def test_float32_out_late_in_a_session():
+    wave = WaveField(freq=4.7, polarized=True, ratio=0.5, phase_diff=1.0)
+    zs = wave.grid(-3, 3, 0.05)
+
+    failures = []
+    # up to a day of animation time
+    for t in (0.0, 61.3, 3600.7, 86400.9):
+        out = np.empty((len(zs), 3), dtype=np.float32)
+        error = np.abs(wave.E(zs.astype(np.float32), t, out=out) - wave.E(zs, t)).max()
+        if error > FLOAT32_TOLERANCE * wave.amplitude():
+            failures.append(f't={t:g} off by {error:.3g}')
+
+    assert not failures, ', '.join(failures)
+
+
+if __name__ == '__main__':
+    test_superposition_grid_changes()
+    test_square_wave()
+    test_extrema()
+    test_float32_out_late_in_a_session()
+    print('ok')
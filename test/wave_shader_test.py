@@ -0,0 +1,139 @@
+'''Checks the wave shader of WaveCurveItem against the CPU evaluation of the wave
+
+The curve vertexes are evaluated by the same vertex shader and uniforms as
+WaveCurveItem.paint() draws with, captured by transform feedback, and
+compared to WaveCurveItem.positions().  Needs an OpenGL 3.1 or ES 3.0
+context, e.g. Mesa llvmpipe (LIBGL_ALWAYS_SOFTWARE=1) under xvfb-run, the
+test is skipped where none can be created.
+
+  xvfb-run -a python test/wave_shader_test.py
+  xvfb-run -a python -m pytest test/wave_shader_test.py
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import ctypes
+
+import numpy as np
+import pytest
+import pyqtgraph as pg
+from OpenGL import GL
+from OpenGL.GL import shaders
+from pyqtgraph.Qt import QtGui
+
+from my_widgets import WaveCurveItem, WAVE_SHADER_CORE, WAVE_SHADER_LEGACY, glsl_sources
+from wave_field import WaveField
+
+# float32 cos on the GPU, relative to the amplitude
+TOLERANCE = 1e-3
+
+WAVES = [WaveField(magnitude=3.0, freq=4.7),
+         WaveField(magnitude=3.0, freq=4.7, polarized=True, ratio=0.5, phase_diff=1.0)]
+
+# up to an hour of animation time
+TIMES = (0.0, 1.3, 3600.7)
+
+
+def gl_context():
+    '''(context, surface), the context current on an offscreen surface, None if it can't be created'''
+    surface = QtGui.QOffscreenSurface()
+    surface.create()
+    context = QtGui.QOpenGLContext()
+    if not context.create() or not context.makeCurrent(surface):
+        return None
+    return context, surface
+
+
+def feedback_program(context):
+    '''The wave shader linked to capture gl_Position by transform feedback, None without core GLSL'''
+    glsl_version, sources = glsl_sources(context, WAVE_SHADER_CORE, WAVE_SHADER_LEGACY)
+    if not glsl_version:
+        return None
+
+    program = GL.glCreateProgram()
+    for kind, source in sources.items():
+        GL.glAttachShader(program, shaders.compileShader([glsl_version, source], kind))
+    GL.glBindAttribLocation(program, 0, "a_position")
+    GL.glBindAttribLocation(program, 1, "a_color")
+    varyings = (ctypes.c_char_p * 1)(b'gl_Position')
+    GL.glTransformFeedbackVaryings(program, 1,
+                                   ctypes.cast(varyings, ctypes.POINTER(ctypes.POINTER(ctypes.c_char))),
+                                   GL.GL_INTERLEAVED_ATTRIBS)
+    GL.glLinkProgram(program)
+    if not GL.glGetProgramiv(program, GL.GL_LINK_STATUS):
+        raise RuntimeError(GL.glGetProgramInfoLog(program))
+    return program
+
+
+def shader_positions(item, program, zs):
+    '''(n,3) vertexes of item on the grid zs as evaluated by program, with an identity u_mvp'''
+    n = len(zs)
+    grid = np.zeros((n, 3), dtype=np.float32)
+    grid[:,2] = zs
+
+    vao = GL.glGenVertexArrays(1)
+    GL.glBindVertexArray(vao)
+    vbo, feedback = GL.glGenBuffers(2)
+    GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbo)
+    GL.glBufferData(GL.GL_ARRAY_BUFFER, grid.nbytes, grid, GL.GL_STATIC_DRAW)
+    GL.glVertexAttribPointer(0, 3, GL.GL_FLOAT, False, 0, None)
+    GL.glEnableVertexAttribArray(0)
+    GL.glBindBuffer(GL.GL_TRANSFORM_FEEDBACK_BUFFER, feedback)
+    GL.glBufferData(GL.GL_TRANSFORM_FEEDBACK_BUFFER, n * 4 * 4, None, GL.GL_STATIC_READ)
+    GL.glBindBufferBase(GL.GL_TRANSFORM_FEEDBACK_BUFFER, 0, feedback)
+
+    GL.glUseProgram(program)
+    GL.glUniformMatrix4fv(GL.glGetUniformLocation(program, "u_mvp"), 1, False,
+                          np.eye(4, dtype=np.float32))
+    item.setWaveUniforms(program)
+
+    GL.glEnable(GL.GL_RASTERIZER_DISCARD)
+    GL.glBeginTransformFeedback(GL.GL_POINTS)
+    GL.glDrawArrays(GL.GL_POINTS, 0, n)
+    GL.glEndTransformFeedback()
+    GL.glDisable(GL.GL_RASTERIZER_DISCARD)
+    GL.glUseProgram(0)
+
+    data = GL.glGetBufferSubData(GL.GL_TRANSFORM_FEEDBACK_BUFFER, 0, n * 4 * 4)
+    vertexes = np.frombuffer(data, dtype=np.float32).reshape((n, 4))[:,:3].copy()
+
+    GL.glDeleteBuffers(2, [vbo, feedback])
+    GL.glDeleteVertexArrays(1, [vao])
+    return vertexes
+
+
+def test_shader_matches_cpu():
+    app = pg.mkQApp()
+    current = gl_context()
+    if current is None:
+        pytest.skip('no OpenGL context')
+    context, surface = current
+    program = feedback_program(context)
+    if program is None:
+        pytest.skip('no OpenGL 3.1 or ES 3.0')
+
+    failures = []
+    for wave in WAVES:
+        zs = wave.grid(-3, 3, 0.05)
+        for field in ('E', 'B'):
+            item = WaveCurveItem(field=field)
+            for t in TIMES:
+                item.setWave(wave, zs, t)
+                error = np.abs(shader_positions(item, program, zs) - item.positions()).max()
+                if error > TOLERANCE * wave.amplitude():
+                    failures.append(f'{field} polarized={wave.polarized} t={t:g} off by {error:.3g}')
+
+    context.doneCurrent()
+    assert not failures, ', '.join(failures)
+
+
+if __name__ == '__main__':
+    try:
+        test_shader_matches_cpu()
+        print('ok')
+    except pytest.skip.Exception as e:
+        print(f'skipped: {e}')
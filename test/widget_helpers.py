@@ -0,0 +1,25 @@
+'''Shared setup of the tests that drive BaseWidget
+
+They run without a display on the Qt offscreen platform, nothing is painted,
+so GL items only prepare their data on the CPU.
+'''
+# local code
+import sys
+import os
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '..'))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def build_widget(chapter, clock='manual', interval=100):
+    '''BaseWidget at Part 1 of chapter, not animating and not prefetching, the QApplication must exist'''
+    from main import BaseWidget, UserMode
+
+    w = BaseWidget(start_segment=1,
+                   start_chapter=chapter,
+                   user_mode=UserMode.SIMULATION,
+                   interval=interval,
+                   clock=clock,
+                   prefetch=False)
+    w.stopAnimating()
+    return w
@@ -0,0 +1,431 @@
+from fractions import Fraction
+from functools import reduce
+from math import gcd
+
+import numpy as np
+
+from buffers import reserve, indices
+
+class WaveField:
+    """The EM plane wave shown by every segment, travelling along +z with c=1
+
+    E_1 = magnitude cos(theta)
+    E_2 = ratio magnitude cos(theta + phase_diff), only when polarized, i.e. chapter > 1
+    theta = freq*z - phase(t)
+    phase(t) = freq*t + phase_offset
+
+    phase_offset is 0 until setFreq() changes the frequency mid animation, it
+    keeps phase(t) continuous so the wave doesn't jump.
+
+    B is E rotated by 90 degrees about z, so it is derived from E rather than
+    evaluated a second time.
+    """
+
+    shader_supported = True    # WaveCurveItem can evaluate it in its vertex shader
+
+    # E_1 = magnitude cos(theta), a maximum at 0 and a minimum at pi
+    EXTREMUM_PHASES = (np.array([0.0, np.pi]), np.array([True, False]), 2*np.pi)
+
+    def __init__(self, magnitude=3.0, freq=0.5, phase_diff=0.0, polarized=False,
+                 ratio=1.0, phase_offset=0.0):
+        self.magnitude = magnitude
+        self.freq = freq
+        self.phase_diff = phase_diff
+        self.polarized = polarized
+        self.ratio = ratio
+        self.phase_offset = phase_offset
+
+        self.__grid_key = None
+        self.__grid = None
+        self.__extremum_shifts = None
+        self.__extremum_zs = None
+        self.__extremum_up = None
+
+    def copy(self, **changes):
+        """New WaveField with the same parameters besides changes, e.g. copy(polarized=True)"""
+        params = dict(magnitude=self.magnitude,
+                      freq=self.freq,
+                      phase_diff=self.phase_diff,
+                      polarized=self.polarized,
+                      ratio=self.ratio,
+                      phase_offset=self.phase_offset)
+        params.update(changes)
+        return WaveField(**params)
+
+    def phase(self, t):
+        """Phase of the wave at z=0 and time t, t may be an array"""
+        return self.freq * np.asarray(t, dtype=float) + self.phase_offset
+
+    def setFreq(self, freq, t):
+        """Changes the frequency at time t without a jump in phase(t)"""
+        self.phase_offset += (self.freq - freq) * t
+        self.freq = freq
+
+    def key(self):
+        """Everything E depends on besides z and t, e.g. for cache keys"""
+        return (self.magnitude, self.freq, self.phase_diff, self.polarized,
+                self.ratio, self.phase_offset)
+
+    def period(self):
+        """Time after which the wave repeats, None if it never does"""
+        return 2*np.pi / self.freq
+
+    def maxFreq(self):
+        """Highest frequency in the wave"""
+        return self.freq
+
+    def amplitude(self):
+        """Largest |E_1| or |E_2|"""
+        return self.magnitude * max(1.0, self.ratio if self.polarized else 0.0)
+
+    def extremumPhases(self):
+        """
+        (thetas, up, period), E_1 repeats every period in theta and is
+        extremal at the increasing thetas in [0, period), a maximum where up
+        """
+        return self.EXTREMUM_PHASES
+
+    def extrema(self, z_min, z_max, t):
+        """
+        Extrema of E_1 in z_min <= z < z_max at time t
+
+        E_1 only depends on theta = freq*z - phase(t), so the extrema of a
+        period of theta, see extremumPhases(), are repeated over the z range
+
+        Returns (zs, up), the z of the extrema in increasing order and
+        whether each is a maximum.  Both are views of buffers of the wave,
+        valid until the next call.
+        """
+        thetas, up, period = self.extremumPhases()
+        phase = self.phase(t)
+
+        # the periods m with freq*z = theta + m*period + phase in the range
+        m_min = np.floor((self.freq * z_min - phase) / period)
+        m_max = np.floor((self.freq * z_max - phase) / period)
+        periods = int(m_max - m_min) + 1
+        n = periods * len(thetas)
+
+        self.__extremum_shifts = reserve(self.__extremum_shifts, periods, dtype=float)
+        shifts = self.__extremum_shifts[:periods]
+        np.add(indices(periods, dtype=float), m_min, out=shifts)
+        shifts *= period
+        shifts += phase
+
+        self.__extremum_zs = reserve(self.__extremum_zs, n, dtype=float)
+        zs = self.__extremum_zs[:n]
+        tiles = zs.reshape((periods, len(thetas)))
+        # column by column, in place broadcasting would buffer the whole array
+        for j, theta in enumerate(thetas):
+            np.add(shifts, theta, out=tiles[:,j])
+        zs /= self.freq
+
+        self.__extremum_up = reserve(self.__extremum_up, n, dtype=bool)
+        ups = self.__extremum_up[:n]
+        ups.reshape((periods, len(thetas)))[:] = up
+
+        first = np.searchsorted(zs, z_min)
+        last = np.searchsorted(zs, z_max)
+        return zs[first:last], ups[first:last]
+
+    def grid(self, z_min, z_max, step):
+        """z samples for graphs, cached until the axes or step change"""
+        key = (z_min, z_max, step)
+        if key != self.__grid_key:
+            self.__grid = np.arange(z_min, z_max+step, step)
+            self.__grid_key = key
+        return self.__grid
+
+    def components(self, theta):
+        """E_1 and E_2 at wave phase theta, shape theta.shape + (2,)"""
+        theta = np.asarray(theta, dtype=float)
+        out = np.zeros(theta.shape + (2,))
+        np.cos(theta, out=out[...,0])
+        out[...,0] *= self.magnitude
+        if self.polarized:
+            np.cos(theta + self.phase_diff, out=out[...,1])
+            out[...,1] *= self.ratio * self.magnitude
+        return out
+
+    def E(self, z, t, out=None):
+        """
+        Positions of the E field tips for samples z at time t
+
+        z        (n,) array of positions along the propagation axis
+        t        float, or (T,) array for a batch of times
+        out      (n,3) array the tips are written to, e.g. a float32 vertex
+                 buffer, for a single t only
+
+        Returns an (n,3) array, or (T,n,3) when t is a batch
+        """
+        z = np.asarray(z, dtype=float)
+        t = np.asarray(t, dtype=float)
+        if t.ndim > 0:
+            theta = self.freq * z[None,:] - self.phase(t)[:,None]
+            out = np.empty(theta.shape + (3,))
+            out[...,:2] = self.components(theta)
+            out[...,2] = z
+            return out
+
+        if out is None:
+            out = np.empty(z.shape + (3,))
+
+        # theta is kept in the E_1 column until it is replaced by E_1, the
+        # phase is reduced in float64 first, out may be float32 and phase(t)
+        # grows without bound
+        theta = out[...,0]
+        np.multiply(z, self.freq, out=theta)
+        theta -= self.phase(t) % (2*np.pi)
+        if self.polarized:
+            np.add(theta, self.phase_diff, out=out[...,1])
+            np.cos(out[...,1], out=out[...,1])
+            out[...,1] *= self.ratio * self.magnitude
+        else:
+            out[...,1] = 0.0
+        np.cos(theta, out=theta)
+        theta *= self.magnitude
+        out[...,2] = z
+        return out
+
+    @staticmethod
+    def B(e, out=None):
+        """B field tips from E field tips, i.e. E rotated by 90 degrees about z"""
+        if out is None:
+            out = np.empty(e.shape)
+        np.negative(e[...,1], out=out[...,0])
+        out[...,1] = e[...,0]
+        out[...,2] = e[...,2]
+        return out
+
+    def fields(self, z, t, out=None):
+        """E and B tips for samples z at time t, see E(), out is a pair of arrays for E and B"""
+        if out is None:
+            out = (None, None)
+        e = self.E(z, t, out=out[0])
+        return e, self.B(e, out=out[1])
+
+
+class SuperpositionField(WaveField):
+    """Sum of N plane waves travelling along +z with c=1
+
+    Component j has an amplitude A_j, a polarization angle psi_j in the
+    xy-plane, a frequency f_j relative to freq and a phase phi_j
+
+    E = magnitude sum_j A_j (cos psi_j, sin psi_j) cos(f_j theta - phi_j)
+    theta = freq*z - phase(t), as for WaveField
+
+    so magnitude, freq and setFreq() act on every component at once.
+    phase_diff, ratio and polarized aren't used.
+
+    The sum over components is a matrix product.  On the z samples of grid()
+    cos(f_j freq z) and sin(f_j freq z) are cached, so a frame of E only
+    takes N cos and sin and two (n,N) by (N,2) products.
+    """
+
+    shader_supported = False
+
+    def __init__(self, components, magnitude=3.0, freq=0.5, phase_offset=0.0):
+        super().__init__(magnitude=magnitude, freq=freq, phase_offset=phase_offset)
+        self.__basis_z = None
+        self.__basis_grid = None
+        self.__basis_key = None
+        self.__basis = None
+        self.__z_1 = None
+        self.__angles = None
+        self.__sums = None
+        self.setComponents(components)
+
+    def setComponents(self, components):
+        """
+        components    (N,4) array of rows (amplitude, polarization angle,
+                      relative frequency, phase), angles in radians
+        """
+        table = np.array(components, dtype=float).reshape((-1,4))
+        if (table[:,2] <= 0).any():
+            raise ValueError('Component frequencies must be positive')
+
+        self.table = table
+        self.__directions = table[:,0,None] * np.stack([np.cos(table[:,1]),
+                                                        np.sin(table[:,1])], axis=-1)
+        self.__freqs = table[:,2]
+        self.__phases = table[:,3]
+        self.__basis_key = None
+        self.__theta_period = self.thetaPeriod(self.__freqs)
+        self.__extremum_phases = None
+
+        # per frame scratch: the wave numbers and phases of the components,
+        # and the weights of the basis
+        self.__coefs = np.empty((2, len(table)))
+        self.__weights = np.empty((2*len(table), 2))
+
+    @staticmethod
+    def load(path):
+        """
+        Components table of a CSV file, one component per row of
+        amplitude, polarization angle, relative frequency and phase, with
+        angles in degrees.  Lines starting with # are skipped.
+        """
+        table = np.loadtxt(path, delimiter=',', comments='#', ndmin=2)
+        if table.shape[1] != 4:
+            raise ValueError(f'{path}: expected 4 columns, got {table.shape[1]}')
+        table[:,[1,3]] = np.radians(table[:,[1,3]])
+        return table
+
+    @staticmethod
+    def squareWave(harmonics=4):
+        """Components table of the first odd harmonics of a square wave along E_1, plus a weaker E_2 wave at 2 freq
+
+        The square wave is +1 for |theta| < pi/2 and -1 elsewhere,
+        i.e. 4/pi sum_k (-1)^k cos((2k+1) theta) / (2k+1)
+        """
+        n = 2*np.arange(harmonics) + 1
+        table = np.zeros((harmonics + 1, 4))
+        table[:-1,0] = 4 / (np.pi * n)
+        table[:-1,2] = n
+        # (-1)^k as a phase of pi
+        table[1:harmonics:2,3] = np.pi
+        table[-1] = [0.5, np.pi/2, 2.0, 0.0]
+        return table
+
+    def copy(self, **changes):
+        params = dict(components=self.table,
+                      magnitude=self.magnitude,
+                      freq=self.freq,
+                      phase_offset=self.phase_offset)
+        params.update(changes)
+        return SuperpositionField(**params)
+
+    def key(self):
+        return (self.magnitude, self.freq, self.phase_offset, self.table.tobytes())
+
+    @staticmethod
+    def thetaPeriod(freqs):
+        """Period in theta of components of relative frequencies freqs, None if they never repeat together"""
+        # the relative frequencies as fractions, the wave repeats when all of them do
+        fractions = [Fraction(f).limit_denominator(64) for f in freqs]
+        if any(abs(float(q) - f) > 1e-9 for q, f in zip(fractions, freqs)):
+            return None
+        numerator = reduce(gcd, (q.numerator for q in fractions))
+        denominator = reduce(lambda a, b: a * b // gcd(a, b), (q.denominator for q in fractions))
+        return 2*np.pi * denominator / numerator
+
+    def period(self):
+        if self.__theta_period is None:
+            return None
+        return self.__theta_period / self.freq
+
+    def maxFreq(self):
+        return self.freq * self.__freqs.max(initial=0.0)
+
+    def amplitude(self):
+        return self.magnitude * np.abs(self.table[:,0]).sum()
+
+    def grid(self, z_min, z_max, step):
+        zs = super().grid(z_min, z_max, step)
+        self.__basis_z = zs
+        self.__basis_grid = (z_min, z_max, step, len(zs))
+        return zs
+
+    def components(self, theta):
+        theta = np.asarray(theta, dtype=float)
+        c = np.cos(np.multiply.outer(theta, self.__freqs) - self.__phases)
+        return self.magnitude * (c @ self.__directions)
+
+    def E(self, z, t, out=None):
+        z = np.asarray(z, dtype=float)
+        t = np.asarray(t, dtype=float)
+        if t.ndim > 0:
+            return super().E(z, t)
+
+        if out is None:
+            out = np.empty(z.shape + (3,))
+
+        # b_j = f_j phase(t) + phi_j
+        b = self.__coefs[1]
+        np.multiply(self.__freqs, self.phase(t), out=b)
+        b += self.__phases
+
+        # the sum over components is written to a contiguous float64 buffer,
+        # matmul into a column slice of out would allocate a copy
+        self.__sums = reserve(self.__sums, len(z), (2,), dtype=float)
+        sums = self.__sums[:len(z)]
+
+        if z is self.__basis_z:
+            # f_j theta - phi_j = f_j freq z - b_j, so
+            # E = [cos(f_j freq z), sin(f_j freq z)] @ [cos(b_j) A_j d_j, sin(b_j) A_j d_j]
+            key = (self.freq, self.__freqs.tobytes(), self.__basis_grid)
+            if self.__basis_key != key:
+                kz = np.multiply.outer(z, self.freq * self.__freqs)
+                self.__basis = np.concatenate([np.cos(kz), np.sin(kz)], axis=1)
+                self.__basis_key = key
+
+            n = len(self.__freqs)
+            weights = self.__weights
+            np.cos(b, out=weights[:n,0])
+            np.sin(b, out=weights[n:,0])
+            weights[:,1] = weights[:,0]
+            weights[:n] *= self.__directions
+            weights[n:] *= self.__directions
+            np.matmul(self.__basis, weights, out=sums)
+        else:
+            # cos(f_j freq z - b_j) for every sample and component, as the
+            # product [z, -1] @ [f_j freq, b_j], broadcasting would buffer
+            n = len(z)
+            self.__z_1 = reserve(self.__z_1, n, (2,), dtype=float)
+            self.__angles = reserve(self.__angles, n, (len(self.__freqs),), dtype=float)
+            z_1 = self.__z_1[:n]
+            angles = self.__angles[:n]
+
+            z_1[:,0] = z
+            z_1[:,1] = -1.0
+            np.multiply(self.__freqs, self.freq, out=self.__coefs[0])
+            np.matmul(z_1, self.__coefs, out=angles)
+            np.cos(angles, out=angles)
+            np.matmul(angles, self.__directions, out=sums)
+
+        sums *= self.magnitude
+        out[...,:2] = sums
+        out[...,2] = z
+        return out
+
+    def extremumPhases(self):
+        if self.__extremum_phases is None:
+            # E_1 / magnitude over a period, sampled finely enough to resolve
+            # the highest frequency, each extremum refined by a parabola
+            # through it and its neighbours, which wrap around the period
+            period = self.__theta_period
+            n = int(np.ceil(period / (2*np.pi / self.__freqs.max() / 64)))
+            step = period / n
+            thetas = step * np.arange(n)
+            e_1 = np.cos(np.multiply.outer(thetas, self.__freqs) - self.__phases) @ self.__directions[:,0]
+
+            y0, y1, y2 = np.roll(e_1, 1), e_1, np.roll(e_1, -1)
+            i = np.flatnonzero(((y1 >= y0) & (y1 > y2)) | ((y1 <= y0) & (y1 < y2)))
+            y0, y1, y2 = y0[i], y1[i], y2[i]
+            curvature = y0 - 2*y1 + y2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                offset = np.where(curvature != 0, 0.5 * (y0 - y2) / curvature, 0.0)
+            extrema = (thetas[i] + step * offset) % period
+
+            order = np.argsort(extrema)
+            self.__extremum_phases = (extrema[order], (curvature < 0)[order], period)
+        return self.__extremum_phases
+
+    def extrema(self, z_min, z_max, t):
+        if self.__theta_period is not None:
+            return super().extrema(z_min, z_max, t)
+
+        # never repeats, sampled finely enough to resolve the highest frequency, then refined by a parabola
+        step = 2*np.pi / self.maxFreq() / 64
+        zs = np.arange(z_min, z_max + step, step)
+        e_1 = self.E(zs, t)[:,0]
+        d = np.diff(e_1)
+        i = np.flatnonzero(np.sign(d[:-1]) != np.sign(d[1:])) + 1
+
+        y0, y1, y2 = e_1[i-1], e_1[i], e_1[i+1]
+        curvature = y0 - 2*y1 + y2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offset = np.where(curvature != 0, 0.5 * (y0 - y2) / curvature, 0.0)
+        z = zs[i] + step * offset
+
+        inside = (z >= z_min) & (z < z_max)
+        return z[inside], (curvature < 0)[inside]